@@ -1,13 +1,23 @@
-import json
-from typing import Dict, Any, Optional
+import logging
+from typing import Optional
+
+import orjson
+from pydantic import TypeAdapter, ValidationError
+
 from backend.models import (
+    AnalysisResult,
     CompanyInput,
     LawfulnessOfProcessing,
     DataSubjectRightsCompliance,
     RiskManagementAndSafeguards,
     AccountabilityAndGovernance,
 )
-from openai import OpenAI
+from backend.openai_clients import get_openai_client
+
+logger = logging.getLogger(__name__)
+
+# Built once; validates the model's JSON reply straight into AnalysisResult
+_ANALYSIS_ADAPTER = TypeAdapter(AnalysisResult)
 
 
 class OpenAIGDPRReActAgent:
@@ -15,15 +25,32 @@ class OpenAIGDPRReActAgent:
     OpenAI-powered Reasoning and Acting (ReAct) Agent for collecting GDPR compliance information
     """
     
+    # Allowed values per enum field, built once at class definition
+    _ENUM_SETS = {
+        "lawfulness_of_processing": frozenset(e.value for e in LawfulnessOfProcessing),
+        "data_subject_rights_compliance": frozenset(e.value for e in DataSubjectRightsCompliance),
+        "risk_management_and_safeguards": frozenset(e.value for e in RiskManagementAndSafeguards),
+        "accountability_and_governance": frozenset(e.value for e in AccountabilityAndGovernance),
+    }
+    
+    _REQUIRED = frozenset({
+        "data_type", "lawfulness_of_processing",
+        "data_subject_rights_compliance", "risk_management_and_safeguards",
+        "accountability_and_governance"
+    })
+    
     def __init__(self, api_key: str = None, model: str = "gpt-4"):
         try:
-            self.openai = OpenAI(api_key=api_key)
+            self.openai = get_openai_client(api_key)
         except Exception:
             raise ValueError("OpenAI API key must be provided either as parameter or environment variable")
         
         self.model = model
         self.collected_data = {}
         self.conversation_history = []
+        # Compact JSON of the last two turns and of collected_data, refreshed on change
+        self._history_tail_json = "[]"
+        self._collected_json = "{}"
         
         # Define the schema for OpenAI to understand
         self.schema_info = self._build_schema_info()
@@ -66,7 +93,7 @@ class OpenAIGDPRReActAgent:
            - "information unavailable": User doesn't have the required information
         """
     
-    def analyze_user_input(self, user_input: str) -> Dict[str, Any]:
+    def analyze_user_input(self, user_input: str) -> AnalysisResult:
         """
         Use OpenAI to analyze user input and determine what information is present/missing
         """
@@ -78,9 +105,9 @@ class OpenAIGDPRReActAgent:
         
         {self.schema_info}
         
-        CONVERSATION HISTORY: {json.dumps(self.conversation_history[-2:], indent=2)}
+        CONVERSATION HISTORY: {self._history_tail_json}
 
-        CURRENT COLLECTED DATA: {json.dumps(self.collected_data, indent=2)}
+        CURRENT COLLECTED DATA: {self._collected_json}
         
         Respond with a JSON object containing:
         {{
@@ -110,26 +137,25 @@ class OpenAIGDPRReActAgent:
                 temperature=0.1
             )
             
-            # Try to parse JSON response
+            # Parse and validate the JSON response in one pass
             try:
-                return json.loads(response.output_text)
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                return {
-                    "extracted_data": {},
-                    "missing_fields": list(self._get_required_fields() - set(self.collected_data.keys())),
-                    "confidence_scores": {},
-                    "analysis_reasoning": "Failed to parse OpenAI response as JSON"
-                }
+                return _ANALYSIS_ADAPTER.validate_json(response.output_text)
+            except ValidationError as e:
+                logger.warning("Invalid analysis response: %s", e)
+                return self._empty_analysis(f"Invalid analysis response: {e.errors()[0]['msg']}")
                 
         except Exception as e:
-            print(f"Error calling OpenAI API: {e}")
-            return {
-                "extracted_data": {},
-                "missing_fields": list(self._get_required_fields() - set(self.collected_data.keys())),
-                "confidence_scores": {},
-                "analysis_reasoning": f"API Error: {str(e)}"
-            }
+            logger.warning("Error calling OpenAI API: %s", e)
+            return self._empty_analysis(f"API Error: {str(e)}")
+    
+    def _empty_analysis(self, reasoning: str) -> AnalysisResult:
+        """
+        Analysis result used when OpenAI gives no usable answer
+        """
+        return AnalysisResult(
+            missing_fields=list(self._get_required_fields() - set(self.collected_data.keys())),
+            analysis_reasoning=reasoning
+        )
     
     def generate_question(self, missing_field: str) -> str:
         """
@@ -142,8 +168,8 @@ class OpenAIGDPRReActAgent:
         {self.schema_info}
         
         CONTEXT:
-        - Current conversation: {json.dumps(self.conversation_history, indent=2)}
-        - Already collected: {json.dumps(self.collected_data, indent=2)}
+        - Current conversation: {self._history_tail_json}
+        - Already collected: {self._collected_json}
         - Missing field: {missing_field}
         
         REQUIREMENTS:
@@ -170,7 +196,7 @@ class OpenAIGDPRReActAgent:
             return response.output_text
             
         except Exception as e:
-            print(f"Error generating question: {e}")
+            logger.warning("Error generating question: %s", e)
             return self._fallback_question(missing_field)
     
     def _fallback_question(self, field: str) -> str:
@@ -186,49 +212,44 @@ class OpenAIGDPRReActAgent:
         }
         return fallback_questions.get(field, f"Please provide information about: {field}")
     
-    def _get_required_fields(self) -> set:
+    def _append_history(self, role: str, content: str):
+        """
+        Record a turn and refresh the serialized tail used in the prompts
+        """
+        self.conversation_history.append({"role": role, "content": content})
+        self._history_tail_json = orjson.dumps(self.conversation_history[-2:]).decode()
+    
+    def _get_required_fields(self) -> frozenset:
         """
         Get set of all required field names
         """
-        return {
-            "data_type", "lawfulness_of_processing",
-            "data_subject_rights_compliance", "risk_management_and_safeguards",
-            "accountability_and_governance"
-        }
+        return self._REQUIRED
     
     def _validate_enum_value(self, field: str, value: str) -> bool:
         """
         Validate that enum values match exactly
         """
-        enum_mappings = {
-            "lawfulness_of_processing": [e.value for e in LawfulnessOfProcessing],
-            "data_subject_rights_compliance": [e.value for e in DataSubjectRightsCompliance],
-            "risk_management_and_safeguards": [e.value for e in RiskManagementAndSafeguards],
-            "accountability_and_governance": [e.value for e in AccountabilityAndGovernance]
-        }
-        
-        if field in enum_mappings:
-            return value in enum_mappings[field]
-        return True  # Non-enum fields
+        allowed = self._ENUM_SETS.get(field)
+        if allowed is None:
+            return True  # Non-enum fields
+        return value in allowed
     
-    async def process_user_input(self, user_input: str) -> str:
+    def process_user_input(self, user_input: str) -> str:
         """
         Main processing method implementing ReAct pattern with OpenAI
         """
-        self.conversation_history.append({
-            "role": "user",
-            "content": user_input
-        })
+        self._append_history("user", user_input)
         
         # REASONING: Use OpenAI to analyze the input
         analysis = self.analyze_user_input(user_input)
         
         # Update collected data with validated extractions
-        if analysis.get("extracted_data"):
-            for field, value in analysis["extracted_data"].items():
-                if self._validate_enum_value(field, value):
+        if analysis.extracted_data:
+            for field, value in analysis.extracted_data.items():
+                if value is not None and self._validate_enum_value(field, value):
                     self.collected_data[field] = value
-                    print(f"✓ Extracted {field}: {value}")
+                    logger.debug("Extracted %s: %s", field, value)
+            self._collected_json = orjson.dumps(self.collected_data).decode()
         
         # ACTING: Determine next action
         missing_fields = list(self._get_required_fields() - set(self.collected_data.keys()))
@@ -245,7 +266,7 @@ class OpenAIGDPRReActAgent:
 
 Is this information accurate? If you need to modify anything, please let me know!
 
-Analysis: {analysis.get('analysis_reasoning', 'Complete data set validated.')}"""
+Analysis: {analysis.analysis_reasoning or 'Complete data set validated.'}"""
                 
             except Exception as e:
                 response = f"I have all fields but there's a validation error: {str(e)}. Please help me correct this."
@@ -255,7 +276,7 @@ Analysis: {analysis.get('analysis_reasoning', 'Complete data set validated.')}""
             next_field = missing_fields[0]
             question = self.generate_question(next_field)
             
-            response = f"""I understand: {analysis.get('analysis_reasoning', 'Analyzing your input...')}
+            response = f"""I understand: {analysis.analysis_reasoning or 'Analyzing your input...'}
 
 **Next, I need information about: `{next_field.replace('_', ' ').title()}`**
 
@@ -263,10 +284,7 @@ Analysis: {analysis.get('analysis_reasoning', 'Complete data set validated.')}""
 
 Progress: {len(self.collected_data)}/{len(self._get_required_fields())} fields collected ✅"""
         
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": response
-        })
+        self._append_history("assistant", response)
         
         return response
     
@@ -274,7 +292,6 @@ Progress: {len(self.collected_data)}/{len(self._get_required_fields())} fields c
         """
         Format collected data for display
         """
-        formatted = ""
         field_labels = {
             "data_type": "📊 Data Type Breached",
             "lawfulness_of_processing": "⚖️ Lawfulness of Processing",
@@ -283,11 +300,10 @@ Progress: {len(self.collected_data)}/{len(self._get_required_fields())} fields c
             "accountability_and_governance": "📋 Accountability & Governance"
         }
         
-        for field, value in self.collected_data.items():
-            label = field_labels.get(field, field.replace('_', ' ').title())
-            formatted += f"{label}: {value}\n"
-        
-        return formatted
+        return "".join(
+            f"{field_labels.get(field, field.replace('_', ' ').title())}: {value}\n"
+            for field, value in self.collected_data.items()
+        )
     
     def get_company_input_model(self) -> Optional[CompanyInput]:
         """
@@ -297,7 +313,7 @@ Progress: {len(self.collected_data)}/{len(self._get_required_fields())} fields c
             try:
                 return CompanyInput(**self.collected_data)
             except Exception as e:
-                print(f"Model validation error: {e}")
+                logger.warning("Model validation error: %s", e)
                 return None
         return None
     
@@ -307,29 +323,6 @@ Progress: {len(self.collected_data)}/{len(self._get_required_fields())} fields c
         """
         self.collected_data = {}
         self.conversation_history = []
-        print("🔄 Agent state reset. Ready to start fresh!")
-    
-
-# Synchronous wrapper for easier usage
-class OpenAIGDPRReActAgentSync:
-    """
-    Synchronous wrapper for the async OpenAI agent
-    """
-    def __init__(self, api_key: str = None, model: str = "gpt-4"):
-        import asyncio
-        self.agent = OpenAIGDPRReActAgent(api_key, model)
-        self.loop = asyncio.new_event_loop()
-    
-    def process_user_input(self, user_input: str) -> str:
-        return self.loop.run_until_complete(self.agent.process_user_input(user_input))
-    
-    def reset(self):
-        self.agent.reset()
-    
-    def get_company_input_model(self) -> Optional[CompanyInput]:
-        return self.agent.get_company_input_model()
-    
-    @property
-    def collected_data(self):
-        return self.agent.collected_data
-
+        self._history_tail_json = "[]"
+        self._collected_json = "{}"
+        logger.debug("Agent state reset")
@@ -7,19 +7,27 @@ for GDPR breach impact prediction.
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Literal, get_args
 import asyncio
 
 from backend.breach_impact_workflow import predict_breach_impact
+from backend.case_gathering_agent import GOVERNANCE_VALUES, LAWFULNESS_VALUES, RIGHTS_VALUES, RISK_VALUES
 
 app = FastAPI(title="GDPR Breach Impact Predictor API", version="1.0.0")
 
+# Valid classification values, shared with the case-gathering agent;
+# pydantic rejects anything else with a 422
+Lawfulness = Literal[LAWFULNESS_VALUES]
+RightsCompliance = Literal[RIGHTS_VALUES]
+RiskManagement = Literal[RISK_VALUES]
+Accountability = Literal[GOVERNANCE_VALUES]
+
 class BreachCaseInput(BaseModel):
     case_description: str
-    lawfulness_of_processing: str
-    data_subject_rights_compliance: str
-    risk_management_and_safeguards: str
-    accountability_and_governance: str
+    lawfulness_of_processing: Lawfulness
+    data_subject_rights_compliance: RightsCompliance
+    risk_management_and_safeguards: RiskManagement
+    accountability_and_governance: Accountability
 
 class SimilarCaseOutput(BaseModel):
     id: str
@@ -52,48 +60,6 @@ async def predict_impact(case_input: BreachCaseInput):
         Similar cases and predicted fine amount
     """
     try:
-        # Validate classifications
-        valid_lawfulness = [
-            "lawful_and_appropriate_basis", "lawful_but_principle_violation", 
-            "no_valid_basis", "exempt_or_restricted"
-        ]
-        valid_rights = [
-            "full_compliance", "partial_compliance", 
-            "non_compliance", "not_triggered"
-        ]
-        valid_risk = [
-            "proactive_safeguards", "reactive_only", 
-            "insufficient_protection", "not_applicable"
-        ]
-        valid_governance = [
-            "fully_accountable", "partially_accountable", 
-            "not_accountable", "not_required"
-        ]
-        
-        if case_input.lawfulness_of_processing not in valid_lawfulness:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid lawfulness_of_processing. Must be one of: {valid_lawfulness}"
-            )
-        
-        if case_input.data_subject_rights_compliance not in valid_rights:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid data_subject_rights_compliance. Must be one of: {valid_rights}"
-            )
-            
-        if case_input.risk_management_and_safeguards not in valid_risk:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid risk_management_and_safeguards. Must be one of: {valid_risk}"
-            )
-            
-        if case_input.accountability_and_governance not in valid_governance:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid accountability_and_governance. Must be one of: {valid_governance}"
-            )
-        
         # Run the workflow
         result = await predict_breach_impact(
             case_description=case_input.case_description,
@@ -131,22 +97,10 @@ async def health_check():
 async def get_valid_classifications():
     """Get all valid classification values"""
     return {
-        "lawfulness_of_processing": [
-            "lawful_and_appropriate_basis", "lawful_but_principle_violation", 
-            "no_valid_basis", "exempt_or_restricted"
-        ],
-        "data_subject_rights_compliance": [
-            "full_compliance", "partial_compliance", 
-            "non_compliance", "not_triggered"
-        ],
-        "risk_management_and_safeguards": [
-            "proactive_safeguards", "reactive_only", 
-            "insufficient_protection", "not_applicable"
-        ],
-        "accountability_and_governance": [
-            "fully_accountable", "partially_accountable", 
-            "not_accountable", "not_required"
-        ]
+        "lawfulness_of_processing": list(get_args(Lawfulness)),
+        "data_subject_rights_compliance": list(get_args(RightsCompliance)),
+        "risk_management_and_safeguards": list(get_args(RiskManagement)),
+        "accountability_and_governance": list(get_args(Accountability))
     }
 
 if __name__ == "__main__":
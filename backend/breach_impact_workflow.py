@@ -12,30 +12,99 @@ Date: July 2025
 
 import os
 import asyncio
-from typing import List, Dict, Any, TypedDict, Annotated
-from dataclasses import dataclass
-from datetime import datetime
+import atexit
+import heapq
+import json
+import logging
+import re
+import string
+import uuid
+from typing import List, Dict, Any, Optional, TypedDict, Annotated
+from dataclasses import asdict, dataclass
+from functools import lru_cache
 
+import httpx
+import numpy as np
+import orjson
 import weaviate
 from weaviate.classes.init import Auth
-from weaviate.classes.query import MetadataQuery
+from weaviate.classes.query import Filter, GroupBy, MetadataQuery
 from dotenv import load_dotenv
+from pydantic import BaseModel, Field
 
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
 from langgraph.checkpoint.memory import MemorySaver
 
+from backend.llm_cache import ResponseCache, make_cache_key
+from backend.openai_clients import get_async_http_client, get_async_openai_client
+
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-llm = ChatOpenAI(
-    model="gpt-4o-2024-08-06",
-    api_key=os.getenv("OPENAI_API_KEY"),
-    temperature=0.1
-)
+logger = logging.getLogger(__name__)
+
+# Upper bound on prediction workflows running at the same time
+MAX_CONCURRENT_PREDICTIONS = 16
+_prediction_semaphore = asyncio.Semaphore(MAX_CONCURRENT_PREDICTIONS)
+
+# Upper bound on similarity LLM calls in flight across all workflows
+MAX_CONCURRENT_SIMILARITY_CALLS = 10
+_similarity_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SIMILARITY_CALLS)
+
+# Fine predicted when there are no precedents to go on
+DEFAULT_PREDICTED_FINE = 1000000
+
+LLM_MODEL = "gpt-4o-2024-08-06"
+LLM_TEMPERATURE = 0.1
+
+class SimilarityOut(BaseModel):
+    similarity_score: int = Field(description="Similarity from 0 to 100, 100 being identical")
+    explanation: str = Field(description="Detailed explanation of why the cases are similar or different")
+
+class SimilarityBatchOut(BaseModel):
+    analyses: List[SimilarityOut] = Field(description="One analysis per precedent case, in the order the cases are given")
+
+class PredictionOut(BaseModel):
+    predicted_fine: int = Field(description="Predicted fine amount in EUR")
+    explanation: str = Field(description="Detailed explanation of the reasoning")
+
+@lru_cache(maxsize=8)
+def _structured_llm(http_async_client: httpx.AsyncClient, schema: type):
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        temperature=LLM_TEMPERATURE,
+        # Concurrent similarity calls share the tuned keep-alive pool
+        http_async_client=http_async_client,
+        max_retries=3
+    ).with_structured_output(schema, method="function_calling")
+
+def structured_llm(schema: type):
+    """The model answering with a schema function call (no free-text parsing),
+    bound to the current shared pool so it is rebuilt after close_clients()
+    """
+    return _structured_llm(get_async_http_client(), schema)
+
+# Completions and search results keyed by a hash of everything that shapes them
+_completion_cache = ResponseCache(maxsize=1000, ttl=3600)
+_search_cache = ResponseCache(maxsize=1000, ttl=3600)
+
+def _completion_key(schema: type, prompt: str) -> str:
+    return make_cache_key(model=LLM_MODEL, temperature=LLM_TEMPERATURE, schema=schema.__name__, prompt=prompt)
+
+async def cached_ainvoke(schema: type, prompt: str):
+    """Return the structured completion for prompt, calling the LLM only on a cache miss"""
+    key = _completion_key(schema, prompt)
+    result = _completion_cache.get(key)
+    if result is None:
+        result = await structured_llm(schema).ainvoke([HumanMessage(content=prompt)])
+        _completion_cache.set(key, result)
+    return result
 
 # Initialize Weaviate client
 try:
@@ -44,11 +113,17 @@ try:
         auth_credentials=Auth.api_key(os.environ["WEAVIATE_API_KEY"]),
         headers={'X-OpenAI-Api-key': os.environ["OPENAI_API_KEY"]}
     )
-    print("Connected to Weaviate:", weaviate_client.is_ready())
+    logger.debug("Connected to Weaviate: %s", weaviate_client.is_ready())
 except Exception as e:
-    print(f"Weaviate connection error: {e}")
+    logger.warning("Weaviate connection error: %s", e)
     weaviate_client = None
 
+# Collection handle resolved once and shared by every query
+PRECEDENT_COLL = weaviate_client.collections.get("Precedent") if weaviate_client else None
+if weaviate_client:
+    # Close the gRPC/HTTP connections cleanly when the process exits
+    atexit.register(weaviate_client.close)
+
 @dataclass
 class SimilarCase:
     id: str
@@ -77,341 +152,426 @@ class WorkflowState(TypedDict):
     prediction_result: PredictionResult
     current_step: str
     error_message: str
+    use_llm_for_prediction: bool
+
+# Comprehensive mock data based on common GDPR breach scenarios, used when
+# Weaviate is not available
+MOCK_CASES = [
+    {
+        "precedent_id": "mock_1",
+        "company": "Meta Platforms Ireland",
+        "violation": "Cross-border data transfers without adequate safeguards",
+        "summary": "Meta was fined for transferring EU user data to the US without adequate protections under GDPR Article 44-49",
+        "fine_eur": 1200000000,
+        "date": "2023-05-22",
+        "authority": "Irish DPC",
+        "lawfulness_of_processing": "no_valid_basis",
+        "data_subject_rights_compliance": "non_compliance",
+        "risk_management_and_safeguards": "insufficient_protection",
+        "accountability_and_governance": "not_accountable",
+        "initial_distance": 0.3
+    },
+    {
+        "precedent_id": "mock_2", 
+        "company": "Amazon Europe Core",
+        "violation": "Inappropriate data processing for advertising purposes without consent",
+        "summary": "Amazon was fined for processing personal data for advertising without proper consent under GDPR Article 6",
+        "fine_eur": 746000000,
+        "date": "2021-07-30",
+        "authority": "Luxembourg CNPD",
+        "lawfulness_of_processing": "lawful_but_principle_violation",
+        "data_subject_rights_compliance": "partial_compliance",
+        "risk_management_and_safeguards": "reactive_only",
+        "accountability_and_governance": "partially_accountable",
+        "initial_distance": 0.4
+    },
+    {
+        "precedent_id": "mock_3",
+        "company": "WhatsApp Ireland Limited", 
+        "violation": "Lack of transparency in data processing operations",
+        "summary": "WhatsApp was fined for not providing sufficient transparency about how personal data is processed",
+        "fine_eur": 225000000,
+        "date": "2021-09-02",
+        "authority": "Irish DPC",
+        "lawfulness_of_processing": "lawful_but_principle_violation",
+        "data_subject_rights_compliance": "partial_compliance",
+        "risk_management_and_safeguards": "reactive_only", 
+        "accountability_and_governance": "partially_accountable",
+        "initial_distance": 0.5
+    },
+    {
+        "precedent_id": "mock_4",
+        "company": "Google LLC",
+        "violation": "Processing personal data without legal basis for advertising",
+        "summary": "Google was fined for processing user data for personalized advertising without valid legal basis",
+        "fine_eur": 90000000,
+        "date": "2022-01-06",
+        "authority": "French CNIL",
+        "lawfulness_of_processing": "no_valid_basis",
+        "data_subject_rights_compliance": "non_compliance",
+        "risk_management_and_safeguards": "insufficient_protection",
+        "accountability_and_governance": "partially_accountable",
+        "initial_distance": 0.45
+    },
+    {
+        "precedent_id": "mock_5",
+        "company": "TikTok Technology Limited",
+        "violation": "Inadequate data protection measures for minors",
+        "summary": "TikTok was fined for inadequate protection of children's personal data and lack of transparency",
+        "fine_eur": 345000000,
+        "date": "2023-09-15",
+        "authority": "Irish DPC", 
+        "lawfulness_of_processing": "lawful_but_principle_violation",
+        "data_subject_rights_compliance": "partial_compliance",
+        "risk_management_and_safeguards": "insufficient_protection",
+        "accountability_and_governance": "partially_accountable",
+        "initial_distance": 0.6
+    }
+]
+
+CLASSIFICATION_FIELDS = (
+    "lawfulness_of_processing", "data_subject_rights_compliance",
+    "risk_management_and_safeguards", "accountability_and_governance"
+)
+MOCK_KEYWORDS = ('data', 'processing', 'consent', 'transfer', 'breach', 'protection')
+# One pass over the text finds every keyword; the lookahead lets matches overlap
+_MOCK_KEYWORD_PATTERN = re.compile("(?=(" + "|".join(map(re.escape, MOCK_KEYWORDS)) + "))")
+
+def keyword_mask(text: str) -> np.ndarray:
+    """Boolean vector over MOCK_KEYWORDS: which keywords occur in text"""
+    found = set(_MOCK_KEYWORD_PATTERN.findall(text.lower()))
+    return np.array([keyword in found for keyword in MOCK_KEYWORDS])
+
+# Precomputed once: which keywords each mock case mentions, and its classifications
+_MOCK_KEYWORD_MATRIX = np.array([keyword_mask(f"{case['violation']} {case['summary']}") for case in MOCK_CASES])
+_MOCK_CLASSIFICATIONS = np.array([[case[field] for field in CLASSIFICATION_FIELDS] for case in MOCK_CASES])
+
+def rank_mock_cases(state: WorkflowState, k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Select the k mock cases most relevant to the query: one point per shared
+    keyword, two per matching classification
+    """
+    query_keywords = keyword_mask(state['case_description'])
+    query_classifications = np.array([state[field] for field in CLASSIFICATION_FIELDS])
+    
+    scores = (_MOCK_KEYWORD_MATRIX & query_keywords).sum(axis=1) \
+        + (_MOCK_CLASSIFICATIONS == query_classifications).sum(axis=1) * 2
+    
+    k = min(k, len(MOCK_CASES))
+    top = np.argpartition(-scores, k - 1)[:k]
+    # Highest score first; ties keep their original order
+    top = top[np.lexsort((top, -scores[top]))]
+    return [MOCK_CASES[i] for i in top]
+
+# Prompt templates, parsed once at import
+SEARCH_TEMPLATE = string.Template("""
+Case Description: $case_description
+Lawfulness of Processing: $lawfulness_of_processing
+Data Subject Rights: $data_subject_rights_compliance
+Risk Management: $risk_management_and_safeguards
+Accountability: $accountability_and_governance
+""")
+
+SIMILARITY_PREAMBLE = string.Template("""
+You are an expert legal analyst specializing in GDPR breach impact assessment.
+
+QUERY CASE:
+Description: $case_description
+Classifications:
+- Lawfulness of Processing: $lawfulness_of_processing
+- Data Subject Rights: $data_subject_rights_compliance
+- Risk Management: $risk_management_and_safeguards
+- Accountability: $accountability_and_governance
+""")
+
+PRECEDENT_TEMPLATE = string.Template("""
+PRECEDENT CASE$number:
+Company: $company
+Violation: $violation
+Summary: $summary
+Fine: €$fine
+Date: $date
+Authority: $authority
+Classifications:
+- Lawfulness of Processing: $case_lawfulness
+- Data Subject Rights: $case_rights
+- Risk Management: $case_risk
+- Accountability: $case_accountability
+
+DETAILED CASE CONTENT:
+$chunks
+""")
+
+SIMILARITY_FOCUS = """
+Focus on:
+- Type of violation and circumstances
+- GDPR articles involved
+- Company size and sector similarities
+- Regulatory authority approach
+- Severity and impact factors
+"""
+
+SIMILARITY_INSTRUCTIONS = """
+Please analyze the similarity between these two cases and provide:
+1. A similarity score from 0-100 (100 being identical)
+2. A detailed explanation of why they are similar or different
+""" + SIMILARITY_FOCUS
+
+BATCH_SIMILARITY_INSTRUCTIONS = string.Template("""
+Please analyze the similarity between the query case and each of the $count precedent cases above and provide, for every precedent case in the order given:
+1. A similarity score from 0-100 (100 being identical)
+2. A detailed explanation of why they are similar or different
+""" + SIMILARITY_FOCUS)
+
+# Precedent properties the later steps read for each candidate
+CANDIDATE_PROPERTIES = [
+    "precedent_id", "company", "violation", "summary", "fine_eur", 
+    "date", "authority", "lawfulness_of_processing", 
+    "data_subject_rights_compliance", "risk_management_and_safeguards",
+    "accountability_and_governance"
+]
+
+# Hybrid search balance: 0 is pure BM25 keyword search, 1 is pure vector search
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.5"))
+
+def query_candidates(search_text: str, k: int = 5, alpha: float = HYBRID_ALPHA) -> List[Dict[str, Any]]:
+    """
+    Find the k precedents closest to search_text. Weaviate groups the hits by
+    precedent_id and returns only the best object of each of the top k groups.
+    """
+    # Perform hybrid search on summary vector
+    response = PRECEDENT_COLL.query.hybrid(
+        query=search_text,
+        target_vector="summary_vector",  # Specify which vector to use
+        alpha=alpha,
+        group_by=GroupBy(prop="precedent_id", objects_per_group=1, number_of_groups=k),
+        return_metadata=MetadataQuery(distance=True),
+        return_properties=CANDIDATE_PROPERTIES
+    )
+    
+    candidates = []
+    for group in response.groups.values():
+        obj = group.objects[0]
+        candidates.append({
+            "precedent_id": obj.properties["precedent_id"],
+            "company": obj.properties["company"],
+            "violation": obj.properties["violation"],
+            "summary": obj.properties["summary"],
+            "fine_eur": obj.properties["fine_eur"],
+            "date": obj.properties["date"],
+            "authority": obj.properties["authority"],
+            "lawfulness_of_processing": obj.properties.get("lawfulness_of_processing"),
+            "data_subject_rights_compliance": obj.properties.get("data_subject_rights_compliance"),
+            "risk_management_and_safeguards": obj.properties.get("risk_management_and_safeguards"),
+            "accountability_and_governance": obj.properties.get("accountability_and_governance"),
+            "initial_distance": obj.metadata.distance if obj.metadata else None
+        })
+    return candidates
 
 def search_similar_cases(state: WorkflowState) -> WorkflowState:
     """
     Step 1: Search Weaviate for similar cases based on case description and classifications
     """
     try:
-        if not weaviate_client or not weaviate_client.is_ready():
+        if PRECEDENT_COLL is None or not weaviate_client.is_ready():
             raise Exception("Weaviate client not connected")
-            
-        collection = weaviate_client.collections.get("Precedent")
         
         # Create search query combining case description and classifications
-        search_text = f"""
-        Case Description: {state['case_description']}
-        Lawfulness of Processing: {state['lawfulness_of_processing']}
-        Data Subject Rights: {state['data_subject_rights_compliance']}
-        Risk Management: {state['risk_management_and_safeguards']}
-        Accountability: {state['accountability_and_governance']}
-        """
+        search_text = SEARCH_TEMPLATE.substitute(state)
         
-        # Perform hybrid search on summary vector
-        response = collection.query.hybrid(
-            query=search_text,
-            target_vector="summary_vector",  # Specify which vector to use
-            limit=50,  # Get 50 candidates first
-            return_metadata=MetadataQuery(distance=True),
-            return_properties=[
-                "precedent_id", "company", "violation", "summary", "fine_eur", 
-                "date", "authority", "lawfulness_of_processing", 
-                "data_subject_rights_compliance", "risk_management_and_safeguards",
-                "accountability_and_governance"
-            ]
-        )
-        
-        # Group by precedent_id and select top 5 unique cases
-        seen_precedents = set()
-        candidates = []
-        
-        for obj in response.objects:
-            precedent_id = obj.properties["precedent_id"]
-            if precedent_id not in seen_precedents and len(candidates) < 5:
-                seen_precedents.add(precedent_id)
-                candidates.append({
-                    "precedent_id": precedent_id,
-                    "company": obj.properties["company"],
-                    "violation": obj.properties["violation"],
-                    "summary": obj.properties["summary"],
-                    "fine_eur": obj.properties["fine_eur"],
-                    "date": obj.properties["date"],
-                    "authority": obj.properties["authority"],
-                    "lawfulness_of_processing": obj.properties.get("lawfulness_of_processing"),
-                    "data_subject_rights_compliance": obj.properties.get("data_subject_rights_compliance"),
-                    "risk_management_and_safeguards": obj.properties.get("risk_management_and_safeguards"),
-                    "accountability_and_governance": obj.properties.get("accountability_and_governance"),
-                    "initial_distance": obj.metadata.distance if obj.metadata else None
-                })
+        search_key = make_cache_key(search_text=search_text, alpha=HYBRID_ALPHA)
+        candidates = _search_cache.get(search_key)
+        if candidates is None:
+            candidates = query_candidates(search_text)
+            _search_cache.set(search_key, candidates)
         
         state["initial_candidates"] = candidates
         state["current_step"] = "similarity_analysis"
         
     except Exception as e:
         # Enhanced mock data if Weaviate is not available (for testing)
-        print(f"Warning in search_similar_cases: {str(e)}, using enhanced mock data")
-        
-        # Create more comprehensive mock data based on common GDPR breach scenarios
-        mock_cases = [
-            {
-                "precedent_id": "mock_1",
-                "company": "Meta Platforms Ireland",
-                "violation": "Cross-border data transfers without adequate safeguards",
-                "summary": "Meta was fined for transferring EU user data to the US without adequate protections under GDPR Article 44-49",
-                "fine_eur": 1200000000,
-                "date": "2023-05-22",
-                "authority": "Irish DPC",
-                "lawfulness_of_processing": "no_valid_basis",
-                "data_subject_rights_compliance": "non_compliance",
-                "risk_management_and_safeguards": "insufficient_protection",
-                "accountability_and_governance": "not_accountable",
-                "initial_distance": 0.3
-            },
-            {
-                "precedent_id": "mock_2", 
-                "company": "Amazon Europe Core",
-                "violation": "Inappropriate data processing for advertising purposes without consent",
-                "summary": "Amazon was fined for processing personal data for advertising without proper consent under GDPR Article 6",
-                "fine_eur": 746000000,
-                "date": "2021-07-30",
-                "authority": "Luxembourg CNPD",
-                "lawfulness_of_processing": "lawful_but_principle_violation",
-                "data_subject_rights_compliance": "partial_compliance",
-                "risk_management_and_safeguards": "reactive_only",
-                "accountability_and_governance": "partially_accountable",
-                "initial_distance": 0.4
-            },
-            {
-                "precedent_id": "mock_3",
-                "company": "WhatsApp Ireland Limited", 
-                "violation": "Lack of transparency in data processing operations",
-                "summary": "WhatsApp was fined for not providing sufficient transparency about how personal data is processed",
-                "fine_eur": 225000000,
-                "date": "2021-09-02",
-                "authority": "Irish DPC",
-                "lawfulness_of_processing": "lawful_but_principle_violation",
-                "data_subject_rights_compliance": "partial_compliance",
-                "risk_management_and_safeguards": "reactive_only", 
-                "accountability_and_governance": "partially_accountable",
-                "initial_distance": 0.5
-            },
-            {
-                "precedent_id": "mock_4",
-                "company": "Google LLC",
-                "violation": "Processing personal data without legal basis for advertising",
-                "summary": "Google was fined for processing user data for personalized advertising without valid legal basis",
-                "fine_eur": 90000000,
-                "date": "2022-01-06",
-                "authority": "French CNIL",
-                "lawfulness_of_processing": "no_valid_basis",
-                "data_subject_rights_compliance": "non_compliance",
-                "risk_management_and_safeguards": "insufficient_protection",
-                "accountability_and_governance": "partially_accountable",
-                "initial_distance": 0.45
-            },
-            {
-                "precedent_id": "mock_5",
-                "company": "TikTok Technology Limited",
-                "violation": "Inadequate data protection measures for minors",
-                "summary": "TikTok was fined for inadequate protection of children's personal data and lack of transparency",
-                "fine_eur": 345000000,
-                "date": "2023-09-15",
-                "authority": "Irish DPC", 
-                "lawfulness_of_processing": "lawful_but_principle_violation",
-                "data_subject_rights_compliance": "partial_compliance",
-                "risk_management_and_safeguards": "insufficient_protection",
-                "accountability_and_governance": "partially_accountable",
-                "initial_distance": 0.6
-            }
-        ]
-        
-        # Select most relevant mock cases based on query characteristics
-        query_lower = state['case_description'].lower()
-        query_classifications = [
-            state['lawfulness_of_processing'],
-            state['data_subject_rights_compliance'], 
-            state['risk_management_and_safeguards'],
-            state['accountability_and_governance']
-        ]
-        
-        # Simple scoring based on keyword matching and classification similarity
-        scored_cases = []
-        for case in mock_cases:
-            score = 0
-            
-            # Keyword matching
-            case_text = f"{case['violation']} {case['summary']}".lower()
-            common_keywords = ['data', 'processing', 'consent', 'transfer', 'breach', 'protection']
-            for keyword in common_keywords:
-                if keyword in query_lower and keyword in case_text:
-                    score += 1
-                    
-            # Classification matching
-            case_classifications = [
-                case['lawfulness_of_processing'],
-                case['data_subject_rights_compliance'],
-                case['risk_management_and_safeguards'], 
-                case['accountability_and_governance']
-            ]
-            
-            matches = sum(1 for q, c in zip(query_classifications, case_classifications) if q == c)
-            score += matches * 2
-            
-            scored_cases.append((score, case))
+        logger.warning("Warning in search_similar_cases: %s, using enhanced mock data", e)
         
-        # Sort by score and take top 5
-        scored_cases.sort(key=lambda x: x[0], reverse=True)
-        state["initial_candidates"] = [case for _, case in scored_cases[:5]]
+        state["initial_candidates"] = rank_mock_cases(state)
         state["current_step"] = "similarity_analysis"
     
     return state
 
-def analyze_case_similarity(case_data: Dict[str, Any], query_case: WorkflowState) -> Dict[str, Any]:
+def fetch_case_chunks(query_case: WorkflowState, candidates: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Fetch the detailed chunks of all candidate precedents with one hybrid query,
+    bucketed by precedent_id
+    """
+    chunks_by_precedent: Dict[str, List[str]] = {}
+    if not candidates or PRECEDENT_COLL is None or not weaviate_client.is_ready():
+        return chunks_by_precedent
+    
+    chunks_response = PRECEDENT_COLL.query.hybrid(
+        query=query_case["case_description"],
+        target_vector="chunk_vector",  # Target the chunk vector field
+        filters=Filter.by_property("precedent_id").contains_any(
+            [case_data["precedent_id"] for case_data in candidates]
+        ),
+        limit=10 * len(candidates),
+        return_properties=["precedent_id", "chunk", "page"],
+        return_metadata=MetadataQuery(distance=True)
+    )
+    
+    # Objects come back ranked, so each bucket keeps the best chunks first
+    for obj in chunks_response.objects:
+        chunks_by_precedent.setdefault(obj.properties["precedent_id"], []).append(obj.properties["chunk"])
+    
+    return chunks_by_precedent
+
+def format_precedent(case_data: Dict[str, Any], case_chunks: List[str], number: str = "") -> str:
+    """
+    Render one precedent case block; number labels it inside a batched prompt
+    """
+    # Use summary if no chunks available
+    if not case_chunks:
+        case_chunks = [case_data.get("summary", "No additional details available")]
+    
+    return PRECEDENT_TEMPLATE.substitute(
+        number=number,
+        company=case_data['company'],
+        violation=case_data['violation'],
+        summary=case_data['summary'],
+        fine=format(case_data['fine_eur'], ','),
+        date=case_data['date'],
+        authority=case_data['authority'],
+        case_lawfulness=case_data.get('lawfulness_of_processing', 'N/A'),
+        case_rights=case_data.get('data_subject_rights_compliance', 'N/A'),
+        case_risk=case_data.get('risk_management_and_safeguards', 'N/A'),
+        case_accountability=case_data.get('accountability_and_governance', 'N/A'),
+        chunks="\n\n".join(case_chunks[:5])  # Use top 5 chunks
+    )
+
+def build_similarity_prompt(case_data: Dict[str, Any], query_case: WorkflowState, case_chunks: List[str]) -> str:
+    """
+    Build the prompt comparing a precedent case with the query case
+    """
+    return SIMILARITY_PREAMBLE.substitute(query_case) + format_precedent(case_data, case_chunks) + SIMILARITY_INSTRUCTIONS
+
+def build_batch_similarity_prompt(candidates: List[Dict[str, Any]], query_case: WorkflowState,
+                                  chunks_by_precedent: Dict[str, List[str]]) -> str:
+    """
+    Build one prompt comparing every candidate with the query case, which is stated only once
+    """
+    precedents = "".join(
+        format_precedent(case_data, chunks_by_precedent.get(case_data["precedent_id"], []), f" {i}")
+        for i, case_data in enumerate(candidates, 1)
+    )
+    return (SIMILARITY_PREAMBLE.substitute(query_case) + precedents
+            + BATCH_SIMILARITY_INSTRUCTIONS.substitute(count=len(candidates)))
+
+def fallback_similarity(case_data: Dict[str, Any], query_case: WorkflowState) -> Dict[str, Any]:
+    """
+    Score a candidate from classification matches alone, used when the LLM is unavailable
+    """
+    # Calculate a basic similarity score based on classification matching
+    query_classifications = [
+        query_case['lawfulness_of_processing'],
+        query_case['data_subject_rights_compliance'], 
+        query_case['risk_management_and_safeguards'],
+        query_case['accountability_and_governance']
+    ]
+    
+    case_classifications = [
+        case_data.get('lawfulness_of_processing'),
+        case_data.get('data_subject_rights_compliance'),
+        case_data.get('risk_management_and_safeguards'),
+        case_data.get('accountability_and_governance')
+    ]
+    
+    matches = sum(1 for q, c in zip(query_classifications, case_classifications) if q == c and q is not None and c is not None)
+    similarity_score = min(20 + (matches * 15), 85)  # Base 20% + 15% per match, max 85%
+    
+    # Create a basic explanation
+    explanation_parts = [f"Similarity based on {matches} matching GDPR classification criteria out of 4 total dimensions."]
+    if matches >= 3:
+        explanation_parts.append("High similarity in regulatory violations and compliance factors.")
+    elif matches >= 2:
+        explanation_parts.append("Moderate similarity in breach characteristics and compliance issues.")
+    else:
+        explanation_parts.append("Limited similarity, but both involve GDPR violations with comparable regulatory response.")
+    explanation = " ".join(explanation_parts)
+        
+    return {
+        **case_data,
+        "similarity_score": similarity_score,
+        "explanation_of_similarity": explanation,
+        "chunks_analyzed": 0
+    }
+
+def to_similarity_analysis(case_data: Dict[str, Any], result: SimilarityOut, case_chunks: List[str]) -> Dict[str, Any]:
+    return {
+        **case_data,
+        "similarity_score": max(0, min(100, result.similarity_score)),
+        "explanation_of_similarity": result.explanation,
+        "chunks_analyzed": max(len(case_chunks), 1)
+    }
+
+async def analyze_case_similarity(case_data: Dict[str, Any], query_case: WorkflowState, case_chunks: List[str]) -> Dict[str, Any]:
     """
     Analyze similarity between a candidate case and the query case
     """
     try:
-        # Get detailed chunks for this precedent case
-        case_chunks = []
-        
-        if weaviate_client and weaviate_client.is_ready():
-            collection = weaviate_client.collections.get("Precedent")
-            
-            # Use hybrid search to find similar chunks for this precedent
-            chunks_response = collection.query.hybrid(
-                query=query_case["case_description"],
-                target_vector="chunk_vector",  # Target the chunk vector field
-                where={
-                    "path": ["precedent_id"],
-                    "operator": "Equal",
-                    "valueText": case_data["precedent_id"]
-                },
-                limit=10,
-                return_properties=["chunk", "page"],
-                return_metadata=MetadataQuery(distance=True)
-            )
-            
-            # Combine chunks for analysis
-            case_chunks = [obj.properties["chunk"] for obj in chunks_response.objects]
-        
-        # Use summary if no chunks available
-        if not case_chunks:
-            case_chunks = [case_data.get("summary", "No additional details available")]
-            
-        combined_chunks = "\n\n".join(case_chunks[:5])  # Use top 5 chunks
-        
-        # Create similarity analysis prompt
-        similarity_prompt = f"""
-        You are an expert legal analyst specializing in GDPR breach impact assessment.
-        
-        QUERY CASE:
-        Description: {query_case['case_description']}
-        Classifications:
-        - Lawfulness of Processing: {query_case['lawfulness_of_processing']}
-        - Data Subject Rights: {query_case['data_subject_rights_compliance']}
-        - Risk Management: {query_case['risk_management_and_safeguards']}
-        - Accountability: {query_case['accountability_and_governance']}
-        
-        PRECEDENT CASE:
-        Company: {case_data['company']}
-        Violation: {case_data['violation']}
-        Summary: {case_data['summary']}
-        Fine: €{case_data['fine_eur']:,}
-        Date: {case_data['date']}
-        Authority: {case_data['authority']}
-        Classifications:
-        - Lawfulness of Processing: {case_data.get('lawfulness_of_processing', 'N/A')}
-        - Data Subject Rights: {case_data.get('data_subject_rights_compliance', 'N/A')}
-        - Risk Management: {case_data.get('risk_management_and_safeguards', 'N/A')}
-        - Accountability: {case_data.get('accountability_and_governance', 'N/A')}
+        similarity_prompt = build_similarity_prompt(case_data, query_case, case_chunks)
         
-        DETAILED CASE CONTENT:
-        {combined_chunks}
+        async with _similarity_semaphore:
+            result = await cached_ainvoke(SimilarityOut, similarity_prompt)
         
-        Please analyze the similarity between these two cases and provide:
-        1. A similarity score from 0-100 (100 being identical)
-        2. A detailed explanation of why they are similar or different
-        
-        Focus on:
-        - Type of violation and circumstances
-        - GDPR articles involved
-        - Company size and sector similarities
-        - Regulatory authority approach
-        - Severity and impact factors
-        
-        Format your response as:
-        SIMILARITY_SCORE: [score]
-        EXPLANATION: [detailed explanation]
-        """
-        
-        response = llm.invoke([HumanMessage(content=similarity_prompt)])
-        content = response.content
-        
-        # Parse response
-        lines = content.split('\n')
-        similarity_score = 0
-        explanation = ""
-        
-        for line in lines:
-            if line.startswith('SIMILARITY_SCORE:'):
-                try:
-                    similarity_score = int(line.split(':')[1].strip())
-                except:
-                    similarity_score = 50  # Default if parsing fails
-            elif line.startswith('EXPLANATION:'):
-                explanation = line.split(':', 1)[1].strip()
-            elif explanation and not line.startswith('SIMILARITY_SCORE:'):
-                explanation += " " + line.strip()
-        
-        return {
-            **case_data,
-            "similarity_score": similarity_score,
-            "explanation_of_similarity": explanation,
-            "chunks_analyzed": len(case_chunks)
-        }
+        return to_similarity_analysis(case_data, result, case_chunks)
         
     except Exception as e:
         # Enhanced fallback for similarity analysis errors
-        print(f"Error in analyze_case_similarity: {str(e)}")
-        
-        # Calculate a basic similarity score based on classification matching
-        query_classifications = [
-            query_case['lawfulness_of_processing'],
-            query_case['data_subject_rights_compliance'], 
-            query_case['risk_management_and_safeguards'],
-            query_case['accountability_and_governance']
-        ]
-        
-        case_classifications = [
-            case_data.get('lawfulness_of_processing'),
-            case_data.get('data_subject_rights_compliance'),
-            case_data.get('risk_management_and_safeguards'),
-            case_data.get('accountability_and_governance')
-        ]
-        
-        matches = sum(1 for q, c in zip(query_classifications, case_classifications) if q == c and q is not None and c is not None)
-        similarity_score = min(20 + (matches * 15), 85)  # Base 20% + 15% per match, max 85%
-        
-        # Create a basic explanation
-        explanation = f"Similarity based on {matches} matching GDPR classification criteria out of 4 total dimensions."
-        if matches >= 3:
-            explanation += " High similarity in regulatory violations and compliance factors."
-        elif matches >= 2:
-            explanation += " Moderate similarity in breach characteristics and compliance issues."
-        else:
-            explanation += " Limited similarity, but both involve GDPR violations with comparable regulatory response."
-            
-        return {
-            **case_data,
-            "similarity_score": similarity_score,
-            "explanation_of_similarity": explanation,
-            "chunks_analyzed": 0
-        }
+        logger.warning("Error in analyze_case_similarity: %s", e)
+        return fallback_similarity(case_data, query_case)
+
+async def analyze_candidates_batched(candidates: List[Dict[str, Any]], query_case: WorkflowState,
+                                     chunks_by_precedent: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """
+    Analyze all candidates in a single LLM call; raises if the answer doesn't cover every candidate
+    """
+    if not candidates:
+        return []
+    
+    prompt = build_batch_similarity_prompt(candidates, query_case, chunks_by_precedent)
+    async with _similarity_semaphore:
+        result = await cached_ainvoke(SimilarityBatchOut, prompt)
+    
+    if len(result.analyses) != len(candidates):
+        raise ValueError(f"expected {len(candidates)} similarity analyses, got {len(result.analyses)}")
+    
+    return [
+        to_similarity_analysis(case_data, analysis, chunks_by_precedent.get(case_data["precedent_id"], []))
+        for case_data, analysis in zip(candidates, result.analyses)
+    ]
 
-def similarity_analysis_step(state: WorkflowState) -> WorkflowState:
+async def similarity_analysis_step(state: WorkflowState) -> WorkflowState:
     """
     Step 2: Analyze similarity for each of the top 5 candidate cases
     """
     try:
-        similarity_analyses = []
+        candidates = state["initial_candidates"]
+        try:
+            chunks_by_precedent = await asyncio.to_thread(fetch_case_chunks, state, candidates)
+        except Exception as e:
+            logger.warning("Error fetching case chunks: %s", e)
+            chunks_by_precedent = {}
         
-        for case_data in state["initial_candidates"]:
-            analysis = analyze_case_similarity(case_data, state)
-            similarity_analyses.append(analysis)
+        try:
+            # One call for all candidates; the query case is sent only once
+            similarity_analyses = await analyze_candidates_batched(candidates, state, chunks_by_precedent)
+        except Exception as e:
+            logger.warning("Batched similarity analysis failed, analyzing candidates one by one: %s", e)
+            similarity_analyses = await asyncio.gather(*(
+                analyze_case_similarity(case_data, state, chunks_by_precedent.get(case_data["precedent_id"], []))
+                for case_data in candidates
+            ))
         
-        # Sort by similarity score and take top 5
-        similarity_analyses.sort(key=lambda x: x["similarity_score"], reverse=True)
-        state["similarity_analyses"] = similarity_analyses[:5]
+        # Keep the 5 most similar cases, best first
+        state["similarity_analyses"] = heapq.nlargest(5, similarity_analyses, key=lambda x: x["similarity_score"])
         state["current_step"] = "combine_results"
         
     except Exception as e:
@@ -420,97 +580,136 @@ def similarity_analysis_step(state: WorkflowState) -> WorkflowState:
     
     return state
 
-def combine_results_step(state: WorkflowState) -> WorkflowState:
+def to_similar_cases(similarity_analyses: List[Dict[str, Any]]) -> List[SimilarCase]:
+    """
+    Convert similarity analyses to SimilarCase format
+    """
+    return [
+        SimilarCase(
+            id=analysis["precedent_id"],
+            company=analysis["company"],
+            description=analysis["violation"],
+            fine=analysis["fine_eur"],
+            similarity=analysis["similarity_score"],
+            explanation_of_similarity=analysis["explanation_of_similarity"],
+            date=analysis["date"],
+            authority=analysis["authority"]
+        )
+        for analysis in similarity_analyses
+    ]
+
+def build_prediction_prompt(query_case: WorkflowState, similar_cases: List[SimilarCase]) -> str:
+    """
+    Build the fine prediction prompt from the query case and its similar precedents
+    """
+    # Create prediction prompt
+    cases_summary = "\n".join([
+        f"Case {i+1}: {case.company} - €{case.fine:,} (Similarity: {case.similarity}%)"
+        for i, case in enumerate(similar_cases)
+    ])
+    
+    return f"""
+    You are an expert GDPR legal analyst tasked with predicting the financial impact of a data breach.
+    
+    QUERY CASE:
+    Description: {query_case['case_description']}
+    Classifications:
+    - Lawfulness of Processing: {query_case['lawfulness_of_processing']}
+    - Data Subject Rights: {query_case['data_subject_rights_compliance']}
+    - Risk Management: {query_case['risk_management_and_safeguards']}
+    - Accountability: {query_case['accountability_and_governance']}
+    
+    SIMILAR PRECEDENT CASES:
+    {cases_summary}
+    
+    DETAILED CASE ANALYSES:
+    {chr(10).join([f"Case {i+1} ({case.company}): {case.explanation_of_similarity}" for i, case in enumerate(similar_cases)])}
+    
+    Based on these similar cases and their similarity scores, predict the likely fine amount in EUR.
+    
+    Consider:
+    1. Weighted average based on similarity scores
+    2. Regulatory trends and inflation
+    3. Specific aggravating or mitigating factors
+    4. Authority enforcement patterns
+    
+    Provide:
+    1. A predicted fine amount in EUR (integer)
+    2. A detailed explanation of your reasoning
+    """
+
+def weighted_fine_prediction(similar_cases: List[SimilarCase]) -> PredictionResult:
+    """
+    Predict the fine as the similarity-weighted mean of the precedent fines
+    """
+    if not similar_cases:
+        return PredictionResult(
+            predicted_fine=DEFAULT_PREDICTED_FINE,
+            explanation_for_fine="No similar precedent cases were found, so a conservative default estimate is used."
+        )
+    
+    total_similarity = sum(case.similarity for case in similar_cases)
+    if total_similarity:
+        predicted_fine = int(sum(case.fine * case.similarity for case in similar_cases) / total_similarity)
+    else:
+        predicted_fine = int(sum(case.fine for case in similar_cases) / len(similar_cases))
+    
+    closest = max(similar_cases, key=lambda case: case.similarity)
+    explanation = (
+        f"Similarity-weighted average of {len(similar_cases)} precedent fines "
+        f"(€{min(case.fine for case in similar_cases):,} to €{max(case.fine for case in similar_cases):,}). "
+        f"The closest precedent is {closest.company} ({closest.similarity}% similar), "
+        f"fined €{closest.fine:,} by {closest.authority}."
+    )
+    return PredictionResult(predicted_fine=predicted_fine, explanation_for_fine=explanation)
+
+async def stream_prediction(prompt: str, queue: asyncio.Queue) -> PredictionOut:
+    """
+    Run the structured prediction, pushing each new piece of the explanation
+    onto queue as the model writes it
+    """
+    key = _completion_key(PredictionOut, prompt)
+    result = _completion_cache.get(key)
+    if result is not None:
+        queue.put_nowait(result.explanation)
+        return result
+    
+    sent = 0
+    # Partial tool-call arguments are parsed as they arrive; the explanation
+    # field follows predicted_fine, so it only ever grows
+    async for partial in structured_llm(PredictionOut).astream([HumanMessage(content=prompt)]):
+        result = partial
+        if len(partial.explanation) > sent:
+            queue.put_nowait(partial.explanation[sent:])
+            sent = len(partial.explanation)
+    
+    if result is None:
+        raise ValueError("Prediction stream ended without a result")
+    _completion_cache.set(key, result)
+    return result
+
+async def combine_results_step(state: WorkflowState, config: RunnableConfig) -> WorkflowState:
     """
     Step 3: Combine similarity analyses and predict fine
     """
     try:
-        # Convert analyses to SimilarCase format
-        similar_cases = []
-        for analysis in state["similarity_analyses"]:
-            similar_case = SimilarCase(
-                id=analysis["precedent_id"],
-                company=analysis["company"],
-                description=analysis["violation"],
-                fine=analysis["fine_eur"],
-                similarity=analysis["similarity_score"],
-                explanation_of_similarity=analysis["explanation_of_similarity"],
-                date=analysis["date"],
-                authority=analysis["authority"]
-            )
-            similar_cases.append(similar_case)
-        
+        similar_cases = to_similar_cases(state["similarity_analyses"])
         state["similar_cases"] = similar_cases
         
-        # Create prediction prompt
-        cases_summary = "\n".join([
-            f"Case {i+1}: {case.company} - €{case.fine:,} (Similarity: {case.similarity}%)"
-            for i, case in enumerate(similar_cases)
-        ])
-        
-        prediction_prompt = f"""
-        You are an expert GDPR legal analyst tasked with predicting the financial impact of a data breach.
-        
-        QUERY CASE:
-        Description: {state['case_description']}
-        Classifications:
-        - Lawfulness of Processing: {state['lawfulness_of_processing']}
-        - Data Subject Rights: {state['data_subject_rights_compliance']}
-        - Risk Management: {state['risk_management_and_safeguards']}
-        - Accountability: {state['accountability_and_governance']}
-        
-        SIMILAR PRECEDENT CASES:
-        {cases_summary}
-        
-        DETAILED CASE ANALYSES:
-        {chr(10).join([f"Case {i+1} ({case.company}): {case.explanation_of_similarity}" for i, case in enumerate(similar_cases)])}
-        
-        Based on these similar cases and their similarity scores, predict the likely fine amount in EUR.
-        
-        Consider:
-        1. Weighted average based on similarity scores
-        2. Regulatory trends and inflation
-        3. Specific aggravating or mitigating factors
-        4. Authority enforcement patterns
-        
-        Provide:
-        1. A predicted fine amount in EUR (integer)
-        2. A detailed explanation of your reasoning
-        
-        Format as:
-        PREDICTED_FINE: [amount]
-        EXPLANATION: [detailed reasoning]
-        """
-        
-        response = llm.invoke([HumanMessage(content=prediction_prompt)])
-        content = response.content
-        
-        # Parse response
-        lines = content.split('\n')
-        predicted_fine = 0
-        explanation = ""
-        
-        for line in lines:
-            if line.startswith('PREDICTED_FINE:'):
-                try:
-                    fine_str = line.split(':')[1].strip().replace(',', '').replace('€', '')
-                    predicted_fine = int(fine_str)
-                except:
-                    # Fallback to weighted average
-                    if similar_cases:
-                        weighted_sum = sum(case.fine * (case.similarity / 100) for case in similar_cases)
-                        predicted_fine = int(weighted_sum / len(similar_cases))
-                    else:
-                        predicted_fine = 1000000  # Default 1M EUR
-            elif line.startswith('EXPLANATION:'):
-                explanation = line.split(':', 1)[1].strip()
-            elif explanation and not line.startswith('PREDICTED_FINE:'):
-                explanation += " " + line.strip()
-        
-        state["prediction_result"] = PredictionResult(
-            predicted_fine=predicted_fine,
-            explanation_for_fine=explanation
-        )
+        if state.get("use_llm_for_prediction"):
+            prediction_prompt = build_prediction_prompt(state, similar_cases)
+            # Set by predict_breach_impact_stream; kept out of the checkpointed state
+            queue = config.get("configurable", {}).get("prediction_stream")
+            if queue is not None:
+                result = await stream_prediction(prediction_prompt, queue)
+            else:
+                result = await cached_ainvoke(PredictionOut, prediction_prompt)
+            state["prediction_result"] = PredictionResult(
+                predicted_fine=max(0, result.predicted_fine),
+                explanation_for_fine=result.explanation
+            )
+        else:
+            state["prediction_result"] = weighted_fine_prediction(similar_cases)
         state["current_step"] = "completed"
         
     except Exception as e:
@@ -519,20 +718,20 @@ def combine_results_step(state: WorkflowState) -> WorkflowState:
     
     return state
 
+# Next node for each current_step; anything else goes back to search
+_ROUTES = {
+    "error": END,
+    "similarity_analysis": "similarity_analysis",
+    "combine_results": "combine_results",
+    "completed": END,
+}
+
 def should_continue(state: WorkflowState) -> str:
     """Router function to determine next step"""
-    current_step = state.get("current_step", "search")
-    
-    if current_step == "error":
-        return END
-    elif current_step == "similarity_analysis":
-        return "similarity_analysis"
-    elif current_step == "combine_results":
-        return "combine_results"
-    elif current_step == "completed":
-        return END
-    else:
-        return "search"
+    return _ROUTES.get(state.get("current_step"), "search")
+
+# Shared checkpointer; checkpoints are namespaced by thread_id
+_CHECKPOINTER = MemorySaver()
 
 # Create the workflow graph
 def create_breach_impact_workflow():
@@ -571,19 +770,41 @@ def create_breach_impact_workflow():
         }
     )
     
-    # Add memory
-    memory = MemorySaver()
-    app = workflow.compile(checkpointer=memory)
+    app = workflow.compile(checkpointer=_CHECKPOINTER)
     
     return app
 
+# Compiled once at import and shared by all predictions
+APP = create_breach_impact_workflow()
+
+async def _run_workflow(workflow, initial_state: WorkflowState, config: Dict[str, Any]):
+    """Run the graph to completion and return the last (state, node) update"""
+    final_state = None
+    final_node = None
+    
+    async for chunk in workflow.astream(initial_state, config):
+        final_state = chunk
+        final_node = next(iter(chunk))  # Get the node name
+    
+    return final_state, final_node
+
+def _format_prediction(similar_cases: List[SimilarCase], prediction_result: PredictionResult) -> Dict[str, Any]:
+    """Serialize a finished prediction into the API response shape"""
+    return {
+        "similar_cases": [asdict(case) for case in similar_cases],
+        "prediction_result": asdict(prediction_result)
+    }
+
 # Convenience function to run the workflow
 async def predict_breach_impact(
     case_description: str,
     lawfulness_of_processing: str,
     data_subject_rights_compliance: str,
     risk_management_and_safeguards: str,
-    accountability_and_governance: str
+    accountability_and_governance: str,
+    use_llm_for_prediction: bool = False,
+    prediction_stream: Optional[asyncio.Queue] = None,
+    thread_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Run the breach impact prediction workflow
@@ -594,13 +815,18 @@ async def predict_breach_impact(
         data_subject_rights_compliance: Classification for data subject rights
         risk_management_and_safeguards: Classification for risk management
         accountability_and_governance: Classification for accountability
+        use_llm_for_prediction: Ask the LLM for the fine instead of using the
+            similarity-weighted average of the precedent fines
+        prediction_stream: Queue that receives the LLM explanation as it is
+            generated (see predict_breach_impact_stream)
+        thread_id: Checkpoint thread id, so callers can correlate the run with
+            their own tracing; must be unique among concurrent runs. A random
+            id is used when omitted
     
     Returns:
         Dictionary containing similar_cases and prediction_result
     """
     
-    workflow = create_breach_impact_workflow()
-    
     initial_state = WorkflowState(
         case_description=case_description,
         lawfulness_of_processing=lawfulness_of_processing,
@@ -612,19 +838,23 @@ async def predict_breach_impact(
         similar_cases=[],
         prediction_result=None,
         current_step="search",
-        error_message=""
+        error_message="",
+        use_llm_for_prediction=use_llm_for_prediction
     )
     
     # Run the workflow
-    config = {"configurable": {"thread_id": f"breach_prediction_{datetime.now().isoformat()}"}}
+    thread_id = thread_id or uuid.uuid4().hex
+    config = {"configurable": {"thread_id": thread_id, "prediction_stream": prediction_stream}}
     
     try:
-        final_state = None
-        final_node = None
-        
-        for chunk in workflow.stream(initial_state, config):
-            final_state = chunk
-            final_node = list(chunk.keys())[0]  # Get the node name
+        # LLM calls are awaited and the synchronous search node runs in
+        # LangGraph's executor, so the event loop stays free for other requests
+        async with _prediction_semaphore:
+            try:
+                final_state, final_node = await _run_workflow(APP, initial_state, config)
+            finally:
+                # Runs are one-shot; don't let the shared saver grow without bound
+                await _CHECKPOINTER.adelete_thread(thread_id)
         
         if final_state and final_node:
             # Extract the actual state from the final node
@@ -636,7 +866,7 @@ async def predict_breach_impact(
                     "error": result_state["error_message"],
                     "similar_cases": [],
                     "prediction_result": {
-                        "predicted_fine": 1000000,
+                        "predicted_fine": DEFAULT_PREDICTED_FINE,
                         "explanation_for_fine": f"Error in prediction: {result_state['error_message']}"
                     }
                 }
@@ -647,35 +877,18 @@ async def predict_breach_impact(
                     "error": "Prediction result not generated",
                     "similar_cases": [],
                     "prediction_result": {
-                        "predicted_fine": 1000000,
+                        "predicted_fine": DEFAULT_PREDICTED_FINE,
                         "explanation_for_fine": "Error: Prediction result not generated"
                     }
                 }
             
-            return {
-                "similar_cases": [
-                    {
-                        "id": case.id,
-                        "company": case.company,
-                        "description": case.description,
-                        "fine": case.fine,
-                        "similarity": case.similarity,
-                        "explanation_of_similarity": case.explanation_of_similarity,
-                        "date": case.date,
-                        "authority": case.authority
-                    } for case in result_state["similar_cases"]
-                ],
-                "prediction_result": {
-                    "predicted_fine": result_state["prediction_result"].predicted_fine,
-                    "explanation_for_fine": result_state["prediction_result"].explanation_for_fine
-                }
-            }
+            return _format_prediction(result_state["similar_cases"], result_state["prediction_result"])
         else:
             return {
                 "error": "Workflow execution failed - no final state",
                 "similar_cases": [],
                 "prediction_result": {
-                    "predicted_fine": 1000000,
+                    "predicted_fine": DEFAULT_PREDICTED_FINE,
                     "explanation_for_fine": "Error: Workflow execution failed"
                 }
             }
@@ -685,11 +898,180 @@ async def predict_breach_impact(
             "error": f"Workflow execution error: {str(e)}",
             "similar_cases": [],
             "prediction_result": {
-                "predicted_fine": 1000000,
+                "predicted_fine": DEFAULT_PREDICTED_FINE,
                 "explanation_for_fine": f"Error in prediction: {str(e)}"
             }
         }
 
+async def predict_breach_impact_stream(
+    case_description: str,
+    lawfulness_of_processing: str,
+    data_subject_rights_compliance: str,
+    risk_management_and_safeguards: str,
+    accountability_and_governance: str,
+    use_llm_for_prediction: bool = True
+):
+    """
+    Run the prediction workflow, yielding JSON events: explanation_delta for
+    each piece of the fine explanation as the LLM writes it, then
+    prediction_complete with the same result predict_breach_impact returns
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(predict_breach_impact(
+        case_description=case_description,
+        lawfulness_of_processing=lawfulness_of_processing,
+        data_subject_rights_compliance=data_subject_rights_compliance,
+        risk_management_and_safeguards=risk_management_and_safeguards,
+        accountability_and_governance=accountability_and_governance,
+        use_llm_for_prediction=use_llm_for_prediction,
+        prediction_stream=queue
+    ))
+    # None marks the end of the stream, however the workflow finishes
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    
+    try:
+        while (delta := await queue.get()) is not None:
+            yield orjson.dumps({"type": "explanation_delta", "data": delta}).decode()
+        yield orjson.dumps({"type": "prediction_complete", "data": task.result()}).decode()
+    finally:
+        task.cancel()
+
+# Batch API settings for offline prediction runs
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_POLL_INTERVAL = 30  # seconds between batch status checks
+_BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+def _batch_request(custom_id: str, schema: type, prompt: str) -> Dict[str, Any]:
+    """One Batch API line forcing the same function call the interactive path uses"""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": LLM_MODEL,
+            "temperature": LLM_TEMPERATURE,
+            "messages": [{"role": "user", "content": prompt}],
+            "tools": [convert_to_openai_tool(schema)],
+            "tool_choice": {"type": "function", "function": {"name": schema.__name__}}
+        }
+    }
+
+async def _run_batch(client, requests: List[Dict[str, Any]], schema: type) -> Dict[str, Any]:
+    """
+    Submit requests as one batch, wait for it to finish and return the parsed
+    outputs by custom_id. Failed lines are left out so callers can fall back.
+    """
+    if not requests:
+        return {}
+    
+    payload = "\n".join(json.dumps(request) for request in requests).encode()
+    input_file = await client.files.create(file=("breach_impact_batch.jsonl", payload), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h"
+    )
+    
+    while batch.status not in _BATCH_FINAL_STATUSES:
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+        batch = await client.batches.retrieve(batch.id)
+    
+    if batch.status != "completed" or not batch.output_file_id:
+        logger.warning("Batch %s ended with status %s", batch.id, batch.status)
+        return {}
+    
+    output = await client.files.content(batch.output_file_id)
+    results = {}
+    for line in output.text.splitlines():
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        try:
+            tool_call = response["body"]["choices"][0]["message"]["tool_calls"][0]
+            results[item["custom_id"]] = schema.model_validate_json(tool_call["function"]["arguments"])
+        except (KeyError, IndexError, ValueError) as e:
+            logger.warning("Unusable batch output for %s: %s", item.get("custom_id"), e)
+    return results
+
+async def predict_breach_impact_batch(cases: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Predict the impact of many cases through the OpenAI Batch API
+    
+    Meant for offline backfills and evaluation runs: completions are billed at
+    the batch rate and may take up to 24h. All similarity prompts go out as
+    one batch, then all fine predictions as a second one.
+    
+    Args:
+        cases: Dicts with the same keys as predict_breach_impact's arguments
+    
+    Returns:
+        One result per case, in input order, shaped like predict_breach_impact's
+    """
+    client = get_async_openai_client(os.getenv("OPENAI_API_KEY"))
+    
+    # Retrieval is cheap and synchronous; reuse the interactive steps
+    states = []
+    chunks = []
+    for case in cases:
+        state = WorkflowState(**case, initial_candidates=[], similarity_analyses=[], similar_cases=[],
+                              prediction_result=None, current_step="search", error_message="",
+                              use_llm_for_prediction=True)
+        state = await asyncio.to_thread(search_similar_cases, state)
+        try:
+            chunks.append(await asyncio.to_thread(fetch_case_chunks, state, state["initial_candidates"]))
+        except Exception as e:
+            logger.warning("Error fetching case chunks: %s", e)
+            chunks.append({})
+        states.append(state)
+    
+    # Batch 1: similarity of every (case, candidate) pair
+    similarity_requests = [
+        _batch_request(
+            f"similarity-{i}-{j}", SimilarityOut,
+            build_similarity_prompt(candidate, state, chunks[i].get(candidate["precedent_id"], []))
+        )
+        for i, state in enumerate(states)
+        for j, candidate in enumerate(state["initial_candidates"])
+    ]
+    similarities = await _run_batch(client, similarity_requests, SimilarityOut)
+    
+    for i, state in enumerate(states):
+        analyses = []
+        for j, candidate in enumerate(state["initial_candidates"]):
+            result = similarities.get(f"similarity-{i}-{j}")
+            if result is None:
+                analyses.append(fallback_similarity(candidate, state))
+                continue
+            analyses.append(to_similarity_analysis(candidate, result, chunks[i].get(candidate["precedent_id"], [])))
+        state["similar_cases"] = to_similar_cases(heapq.nlargest(5, analyses, key=lambda x: x["similarity_score"]))
+    
+    # Batch 2: one fine prediction per case
+    prediction_requests = [
+        _batch_request(f"prediction-{i}", PredictionOut, build_prediction_prompt(state, state["similar_cases"]))
+        for i, state in enumerate(states)
+    ]
+    predictions = await _run_batch(client, prediction_requests, PredictionOut)
+    
+    results = []
+    for i, state in enumerate(states):
+        prediction = predictions.get(f"prediction-{i}")
+        if prediction is None:
+            results.append({
+                "error": "Batch prediction not generated",
+                "similar_cases": [asdict(case) for case in state["similar_cases"]],
+                "prediction_result": {
+                    "predicted_fine": DEFAULT_PREDICTED_FINE,
+                    "explanation_for_fine": "Error: Batch prediction not generated"
+                }
+            })
+            continue
+        results.append(_format_prediction(
+            state["similar_cases"],
+            PredictionResult(predicted_fine=max(0, prediction.predicted_fine), explanation_for_fine=prediction.explanation)
+        ))
+    return results
+
 # Test function
 def test_workflow():
     """Test the workflow with a sample case"""
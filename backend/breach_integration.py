@@ -9,11 +9,6 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List
 import asyncio
-import sys
-import os
-
-# Add the project root to the path so we can import the workflow
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from backend.breach_impact_workflow import predict_breach_impact
 
@@ -102,7 +97,7 @@ async def get_breach_classifications():
 """
 To integrate this with your existing backend/main.py, add these lines:
 
-from breach_integration import router as breach_router
+from backend.breach_integration import router as breach_router
 
 app.include_router(breach_router)
 
@@ -1,12 +1,27 @@
-import openai
-from pydantic import BaseModel
-from typing import List, Dict, Any, AsyncGenerator, Optional
-import json
+from typing import List, Dict, Any, AsyncGenerator, Optional, Sequence, Tuple
 import asyncio
+import logging
+from dataclasses import asdict, dataclass
 import os
+import re
+import time
 
+import orjson
+from pydantic import TypeAdapter, ValidationError
 
-class BreachInfo(BaseModel):
+from backend.openai_clients import get_async_openai_client
+from backend.llm_cache import ResponseCache, SemanticCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+# Stream events are (type, data) pairs; the server serializes them once for
+# the wire and can act on classification_complete without parsing anything
+Event = Tuple[str, Any]
+
+
+@dataclass(slots=True)
+class BreachInfo:
     """Data structure to hold breach information as it's gathered"""
     case_description: str = ""
     lawfulness_of_processing: str = ""
@@ -16,59 +31,297 @@ class BreachInfo(BaseModel):
     conversation_complete: bool = False
     iteration_count: int = 0
 
+    @classmethod
+    def completed(cls, arguments: str) -> "BreachInfo":
+        """Build a completed record straight from the tool-call JSON, ignoring unknown keys"""
+        info = _BREACH_INFO_ADAPTER.validate_json(arguments)
+        info.conversation_complete = True
+        return info
+
+
+# Parses and validates tool-call arguments in one pass, without an intermediate dict
+_BREACH_INFO_ADAPTER = TypeAdapter(BreachInfo)
+
+
+# Allowed values for each classification dimension
+LAWFULNESS_VALUES = ("lawful_and_appropriate_basis", "lawful_but_principle_violation", "no_valid_basis", "exempt_or_restricted")
+RIGHTS_VALUES = ("full_compliance", "partial_compliance", "non_compliance", "not_triggered")
+RISK_VALUES = ("proactive_safeguards", "reactive_only", "insufficient_protection", "not_applicable")
+GOVERNANCE_VALUES = ("fully_accountable", "partially_accountable", "not_accountable", "not_required")
+
+VALID_LAWFULNESS = frozenset(LAWFULNESS_VALUES)
+VALID_RIGHTS = frozenset(RIGHTS_VALUES)
+VALID_RISK = frozenset(RISK_VALUES)
+VALID_GOVERNANCE = frozenset(GOVERNANCE_VALUES)
+CLASSIFICATION_DIMENSIONS = ("lawfulness_of_processing", "data_subject_rights_compliance",
+                             "risk_management_and_safeguards", "accountability_and_governance")
+
+# Tools for function calling, shared by all agents
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "finalize_classification",
+        "description": "Finalize the breach classification with the gathered information",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "case_description": {
+                    "type": "string",
+                    "description": "Complete description of the breach case"
+                },
+                "lawfulness_of_processing": {
+                    "type": "string",
+                    "enum": list(LAWFULNESS_VALUES),
+                    "description": "Classification for lawfulness of processing"
+                },
+                "data_subject_rights_compliance": {
+                    "type": "string", 
+                    "enum": list(RIGHTS_VALUES),
+                    "description": "Classification for data subject rights compliance"
+                },
+                "risk_management_and_safeguards": {
+                    "type": "string",
+                    "enum": list(RISK_VALUES),
+                    "description": "Classification for risk management and safeguards"
+                },
+                "accountability_and_governance": {
+                    "type": "string",
+                    "enum": list(GOVERNANCE_VALUES),
+                    "description": "Classification for accountability and governance"
+                }
+            },
+            "required": ["case_description", "lawfulness_of_processing", "data_subject_rights_compliance", "risk_management_and_safeguards", "accountability_and_governance"]
+        }
+    }
+}]
+
+# Forced classification prompt and its structured-output schema
+# Filling four enum fields from a transcript doesn't need the full model
+CLASSIFICATION_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-small"
+CLASSIFICATION_SYSTEM_PROMPT = "You are an expert GDPR case analysis assistant. Analyze the conversation history and provide a structured classification of the breach incident based on the 4 key dimensions. Make reasonable inferences where information is incomplete."
+
+CLASSIFICATION_PROMPT_TEMPLATE = """
+            Based on the following conversation about a GDPR breach incident, please provide a comprehensive classification across the 4 key dimensions.
 
-class CaseGatheringAgent:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.client = openai.AsyncOpenAI(api_key=api_key)
-        
-        self.system_instructions = """You are an expert GDPR case analysis assistant helping Data Protection Officers classify breach incidents.
-
-Your goal is to gather information through natural conversation to classify a GDPR breach case across 4 key dimensions:
-
-1. **Lawfulness of Processing** (choose one):
-   - lawful_and_appropriate_basis: Processing had clear legal basis and was appropriate
-   - lawful_but_principle_violation: Legal basis existed but violated GDPR principles (fairness, transparency, etc.)
-   - no_valid_basis: No valid legal basis for processing
-   - exempt_or_restricted: Processing was exempt from GDPR or had restricted applicability
-
-2. **Data Subject Rights Compliance** (choose one):
-   - full_compliance: All relevant data subject rights were properly handled
-   - partial_compliance: Some rights were handled but with deficiencies
-   - non_compliance: Failed to respect data subject rights
-   - not_triggered: No data subject rights were triggered in this case
-
-3. **Risk Management and Safeguards** (choose one):
-   - proactive_safeguards: Had comprehensive preventive security measures
-   - reactive_only: Only responded after incident occurred
-   - insufficient_protection: Inadequate security measures in place
-   - not_applicable: Risk management not relevant to this case
-
-4. **Accountability and Governance** (choose one):
-   - fully_accountable: Complete documentation, policies, and governance
-   - partially_accountable: Some accountability measures but gaps exist  
-   - not_accountable: Failed to demonstrate compliance accountability
-   - not_required: Accountability requirements didn't apply
-
-**Your approach:**
-- Ask focused, relevant questions to understand the case
-- Be conversational and helpful, not interrogational
-- Ask 1-2 questions at a time, don't overwhelm
-- **CRITICAL: You have a maximum of 4 question rounds. After 4 exchanges, you MUST call finalize_classification even if information is incomplete**
-- When you have enough information for all 4 dimensions OR after 4 exchanges, call the finalize_classification function immediately
-- DO NOT ask for user confirmation of the classification - make the expert decision based on the information provided
-- If the user provides a case description upfront, acknowledge it and ask follow-up questions for missing information
-- Make reasonable inferences and expert judgments when information is incomplete
-
-**Important:**
-- Don't assume company size, revenue, or industry - focus on the incident itself
-- Keep questions practical and specific to the breach incident
-- Be empathetic - this person is dealing with a stressful situation
-- Make classification decisions based on your expert knowledge even with incomplete information
-- Once you have sufficient information OR reach 4 exchanges, classify immediately using the finalize_classification function
-- If information is missing after 4 rounds, make reasonable inferences based on typical scenarios
-
-**Examples of good questions:**
+            Conversation History:
+            {conversation_text}
+
+            Please analyze the conversation and classify the breach case across these dimensions:
+
+            1. **Lawfulness of Processing** - Choose one:
+               - lawful_and_appropriate_basis: Processing had clear legal basis and was appropriate
+               - lawful_but_principle_violation: Legal basis existed but violated GDPR principles
+               - no_valid_basis: No valid legal basis for processing
+               - exempt_or_restricted: Processing was exempt from GDPR or had restricted applicability
+
+            2. **Data Subject Rights Compliance** - Choose one:
+               - full_compliance: All relevant data subject rights were properly handled
+               - partial_compliance: Some rights were handled but with deficiencies
+               - non_compliance: Failed to respect data subject rights
+               - not_triggered: No data subject rights were triggered in this case
+
+            3. **Risk Management and Safeguards** - Choose one:
+               - proactive_safeguards: Had comprehensive preventive security measures
+               - reactive_only: Only responded after incident occurred
+               - insufficient_protection: Inadequate security measures in place
+               - not_applicable: Risk management not relevant to this case
+
+            4. **Accountability and Governance** - Choose one:
+               - fully_accountable: Complete documentation, policies, and governance
+               - partially_accountable: Some accountability measures but gaps exist
+               - not_accountable: Failed to demonstrate compliance accountability
+               - not_required: Accountability requirements didn't apply
+
+            Provide a comprehensive case description summarizing the incident and your classification rationale.
+            """
+
+CLASSIFICATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "breach_classification",
+        # Strict mode makes OpenAI guarantee schema-conformant output, so the
+        # result is used as-is without client-side validation
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "case_description": {
+                    "type": "string",
+                    "description": "Complete description of the breach case based on conversation"
+                },
+                "lawfulness_of_processing": {
+                    "type": "string",
+                    "enum": list(LAWFULNESS_VALUES),
+                    "description": "Classification for lawfulness of processing"
+                },
+                "data_subject_rights_compliance": {
+                    "type": "string", 
+                    "enum": list(RIGHTS_VALUES),
+                    "description": "Classification for data subject rights compliance"
+                },
+                "risk_management_and_safeguards": {
+                    "type": "string",
+                    "enum": list(RISK_VALUES),
+                    "description": "Classification for risk management and safeguards"
+                },
+                "accountability_and_governance": {
+                    "type": "string",
+                    "enum": list(GOVERNANCE_VALUES),
+                    "description": "Classification for accountability and governance"
+                }
+            },
+            "required": ["case_description", "lawfulness_of_processing", "data_subject_rights_compliance", "risk_management_and_safeguards", "accountability_and_governance"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Phrases in the user's own messages that point clearly at one value per
+# dimension; used to skip the LLM call when a conversation is clear-cut
+_RULE_PATTERNS = {
+    "lawfulness_of_processing": {
+        "no_valid_basis": r"no (valid |legal |lawful )*basis|without (a |any )?(legal basis|consent)|unlawful(ly)? process|did(n't| not) (have|obtain|ask for) consent",
+        "lawful_but_principle_violation": r"(kept|retained|stored) (the )?(data )?(longer|too long)|not transparent|lack of transparency|excessive data|data minimi[sz]ation|purpose limitation",
+        "lawful_and_appropriate_basis": r"(valid|clear|proper) legal basis|(explicit|valid) consent (was )?(obtained|given)|contractual (necessity|basis)",
+        "exempt_or_restricted": r"household exemption|purely personal|national security",
+    },
+    "data_subject_rights_compliance": {
+        "non_compliance": r"(not|never) (been )?notif(ied|y)|ignored (the |their )?(access|erasure|deletion) requests?|did(n't| not) (respond|inform)",
+        "partial_compliance": r"notified (them )?(late|with (a )?delay)|(late|delayed) notification|partially (notified|informed|responded)",
+        "full_compliance": r"notified (all )?(affected )?(data subjects|users|customers|individuals) (within|immediately|promptly)|responded to all requests",
+        "not_triggered": r"no (data subject )?requests? (were|was) (made|received)|no personal data (was )?(exposed|affected)",
+    },
+    "risk_management_and_safeguards": {
+        "insufficient_protection": r"ransomware|phishing|unencrypted|not encrypted|no encryption|weak passwords?|no (mfa|2fa|two-factor)|unpatched|outdated (software|systems?)|misconfigur",
+        "reactive_only": r"only after|after the (breach|incident|attack),? (we )?(implemented|introduced|added)",
+        "proactive_safeguards": r"(?<!not )(?<!un)\bencrypted|encryption at rest|(?<!no )\b(mfa|multi-factor)|penetration test|regular (security )?audits",
+        "not_applicable": r"no security measures (were )?(relevant|applicable)",
+    },
+    "accountability_and_governance": {
+        "not_accountable": r"no (dpo|data protection officer|records of processing|documentation|policies)|(no|without) (a )?dpia",
+        "partially_accountable": r"(outdated|incomplete) (policies|documentation|records)|partial documentation",
+        "fully_accountable": r"(documented|written) (policies|procedures)|appointed (a )?(dpo|data protection officer)|(?<!no )\brecords of processing",
+        "not_required": r"not required to (appoint|keep|have)",
+    },
+}
+# All rules fused into one alternation, scanned once; each value is a named
+# group r<i>, and _RULE_TARGETS maps the group back to (dimension, value)
+_RULE_TARGETS = {
+    f"r{i}": (dimension, value)
+    for i, (dimension, value) in enumerate(
+        (dimension, value) for dimension, values in _RULE_PATTERNS.items() for value in values
+    )
+}
+_RULE_SCANNER = re.compile(
+    "|".join(f"(?P<{group}>{_RULE_PATTERNS[dimension][value]})" for group, (dimension, value) in _RULE_TARGETS.items()),
+    re.IGNORECASE
+)
+# Share of matches the leading value needs in every dimension
+RULE_CONFIDENCE_THRESHOLD = 0.8
+
+
+def quick_classify(transcript: Sequence[str]) -> Tuple[Dict[str, str], float]:
+    """Rule-based classification of "role: content" transcript lines.
+    
+    Only user lines are scored, since the assistant's questions mention every
+    option. Each dimension's confidence is the leading value's share of all
+    matches (zero below two matches); the overall confidence is the lowest.
+    """
+    user_text = "\n".join(line[6:] for line in transcript if line.startswith("user: "))
+    counts = {dimension: dict.fromkeys(values, 0) for dimension, values in _RULE_PATTERNS.items()}
+    for match in _RULE_SCANNER.finditer(user_text):
+        dimension, value = _RULE_TARGETS[match.lastgroup]
+        counts[dimension][value] += 1
+    
+    classification = {}
+    confidence = 1.0
+    for dimension, value_counts in counts.items():
+        value, top = max(value_counts.items(), key=lambda item: item[1])
+        total = sum(value_counts.values())
+        classification[dimension] = value
+        confidence = min(confidence, top / total if top >= 2 else 0.0)
+    classification["case_description"] = describe_case(transcript)
+    return classification, confidence
+
+
+# Markdown shown to the user once a case is classified, filled with format_map
+RESULT_TEMPLATE = """**Perfect! I've classified your case as follows:**
+
+**Case Description:** {case_description}
+
+**Classification Complete:**
+- **Lawfulness of Processing:** {lawfulness_of_processing}
+- **Data Subject Rights Compliance:** {data_subject_rights_compliance}  
+- **Risk Management and Safeguards:** {risk_management_and_safeguards}
+- **Accountability and Governance:** {accountability_and_governance}
+
+This classification will help with subsequent analysis and fine prediction. The case gathering is now complete and you will be redirected to the case analysis dashboard."""
+
+FORCED_RESULT_TEMPLATE = """**Final Classification Complete:**
+
+**Lawfulness of Processing:** {lawfulness_of_processing}
+**Data Subject Rights Compliance:** {data_subject_rights_compliance}
+**Risk Management and Safeguards:** {risk_management_and_safeguards}
+**Accountability and Governance:** {accountability_and_governance}
+
+**Case Summary:** {case_description}
+
+This classification is based on the information provided during our conversation. The case gathering is now complete and you will be redirected to the case analysis dashboard."""
+
+
+MAX_ITERATIONS = 4
+
+# Streamed text is coalesced into frames of at least this many characters,
+# or whatever arrived within this many seconds, whichever comes first
+FLUSH_CHARS = 64
+FLUSH_INTERVAL = 0.02
+
+# How many recent messages the forced classification sees
+TRANSCRIPT_LINES = 8
+
+# Most recent messages sent to the model verbatim; older ones leave the
+# window this many at a time
+HISTORY_WINDOW = 20
+HISTORY_EVICTION_STEP = 10
+
+
+def render_transcript(messages: List[Dict[str, str]]) -> List[str]:
+    """"role: content" lines of the most recent non-system messages"""
+    lines = [f"{m['role']}: {m['content']}" for m in messages if m["role"] != "system"]
+    return lines[-TRANSCRIPT_LINES:]
+
+
+def windowed_history(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """The messages sent to the model: instructions and opening message, a
+    digest of the user's evicted answers, then the recent tail.
+    
+    Messages are evicted in blocks of HISTORY_EVICTION_STEP, so the prefix
+    only changes once per block and stays cacheable between evictions
+    """
+    head, body = messages[:2], messages[2:]
+    overflow = len(body) - HISTORY_WINDOW
+    if overflow <= 0:
+        return messages
+    evicted = -(-overflow // HISTORY_EVICTION_STEP) * HISTORY_EVICTION_STEP
+    earlier = "\n".join(f"- {m['content']}" for m in body[:evicted] if m["role"] == "user")
+    digest = {"role": "system", "content": f"Earlier answers from the user (older turns omitted):\n{earlier}"}
+    return [*head, digest, *body[evicted:]]
+
+SYSTEM_INSTRUCTIONS = """You are an expert GDPR case analysis assistant helping Data Protection Officers classify a breach incident through conversation.
+
+Classify the case on 4 dimensions, one value each:
+1. lawfulness_of_processing: lawful_and_appropriate_basis | lawful_but_principle_violation (basis existed, principles such as fairness/transparency violated) | no_valid_basis | exempt_or_restricted
+2. data_subject_rights_compliance: full_compliance | partial_compliance | non_compliance | not_triggered
+3. risk_management_and_safeguards: proactive_safeguards | reactive_only (responded only after the incident) | insufficient_protection | not_applicable
+4. accountability_and_governance: fully_accountable | partially_accountable | not_accountable | not_required
+
+Be empathetic and conversational: ask 1-2 practical questions about the incident itself per turn; don't assume company size, revenue or industry. If a case description is given upfront, only ask about what is missing.
+At most 4 exchanges: call finalize_classification as soon as all 4 dimensions can be judged, and at the 4th exchange at the latest, inferring gaps from typical scenarios. Never ask the user to confirm the classification.
+"""
+
+# Only sent with the opening exchange; later turns follow the conversation's own questions
+EXAMPLE_QUESTIONS = """Examples of good questions:
 - "What type of personal data was involved in this incident?"
 - "How did the breach occur? Was it due to a technical failure, human error, or malicious attack?"
 - "What legal basis was your organization using to process this data?"
@@ -77,47 +330,89 @@ Your goal is to gather information through natural conversation to classify a GD
 - "How did your organization respond when the breach was discovered?"
 - "Does your organization have documented data protection policies and procedures?"
 """
+
+
+OPENING_PREFIX = "I need help classifying a GDPR breach case. "
+OPENING_DETAILS = "Here's what I know so far: "
+OPENING_WITHOUT_DETAILS = "I'd like to provide information about the incident."
+
+
+def opening_message(initial_description: str = "") -> str:
+    """The user's first message, which opens every conversation"""
+    details = (f"{OPENING_DETAILS}{initial_description}" if initial_description
+               else OPENING_WITHOUT_DETAILS)
+    return f"{OPENING_PREFIX}{details}"
+
+
+def describe_case(transcript: Sequence[str]) -> str:
+    """The user's own account of the case from "role: content" transcript
+    lines, without the boilerplate of the opening message
+    """
+    parts = []
+    for line in transcript:
+        if not line.startswith("user: "):
+            continue
+        text = line[6:]
+        if text.startswith(OPENING_PREFIX):
+            text = text[len(OPENING_PREFIX):]
+            if text == OPENING_WITHOUT_DETAILS:
+                continue
+            text = text.removeprefix(OPENING_DETAILS)
+        parts.append(text)
+    return " ".join(parts) or "GDPR breach case from conversation"
+
+
+def _context_suffix(iteration_count: int) -> str:
+    """Status note sent to the model for the given exchange"""
+    context = f"\n\n**Current Status:** This is exchange {iteration_count}/{MAX_ITERATIONS} maximum."
+    
+    if iteration_count >= MAX_ITERATIONS:
+        context += " **IMPORTANT: This is the final exchange. You MUST call the finalize_classification function now with your best assessment based on available information. Do not ask more questions.**"
+    elif iteration_count == MAX_ITERATIONS - 1:
+        context += " **WARNING: This is the second-to-last exchange. After the user's next response, you must classify immediately.**"
+    else:
+        context += " Gather key information efficiently. Remember to call finalize_classification when you have sufficient information."
+
+    if iteration_count <= 1:
+        context += "\n\n" + EXAMPLE_QUESTIONS
+    return context
+
+# The status goes last, as a trailing system message, so the instructions
+# and the whole history before it stay a byte-identical prefix across turns,
+# which lets OpenAI reuse its prompt cache
+_STATUS_MESSAGES = tuple({"role": "system", "content": _context_suffix(i).strip()} for i in range(MAX_ITERATIONS + 1))
+
+
+class CaseGatheringAgent:
+    def __init__(self, api_key: str):
+        self._api_key = api_key
+        # Forced classifications of identical conversations are reused...
+        self._classification_cache = ResponseCache(maxsize=512, ttl=3600)
+        # ...and so are those of conversations describing a near-identical breach
+        self._semantic_cache = SemanticCache(threshold=0.92)
+        self._warm_up_task = None
+        try:
+            # Open the connection now so the first conversation doesn't pay for the handshake
+            self._warm_up_task = asyncio.get_running_loop().create_task(self.warm_up())
+        except RuntimeError:
+            pass  # No loop yet; the app calls warm_up() on startup
         
         self.current_breach_info = BreachInfo()
-        
-        # Define tools for function calling
-        self.tools = [{
-            "type": "function",
-            "function": {
-                "name": "finalize_classification",
-                "description": "Finalize the breach classification with the gathered information",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "case_description": {
-                            "type": "string",
-                            "description": "Complete description of the breach case"
-                        },
-                        "lawfulness_of_processing": {
-                            "type": "string",
-                            "enum": ["lawful_and_appropriate_basis", "lawful_but_principle_violation", "no_valid_basis", "exempt_or_restricted"],
-                            "description": "Classification for lawfulness of processing"
-                        },
-                        "data_subject_rights_compliance": {
-                            "type": "string", 
-                            "enum": ["full_compliance", "partial_compliance", "non_compliance", "not_triggered"],
-                            "description": "Classification for data subject rights compliance"
-                        },
-                        "risk_management_and_safeguards": {
-                            "type": "string",
-                            "enum": ["proactive_safeguards", "reactive_only", "insufficient_protection", "not_applicable"],
-                            "description": "Classification for risk management and safeguards"
-                        },
-                        "accountability_and_governance": {
-                            "type": "string",
-                            "enum": ["fully_accountable", "partially_accountable", "not_accountable", "not_required"],
-                            "description": "Classification for accountability and governance"
-                        }
-                    },
-                    "required": ["case_description", "lawfulness_of_processing", "data_subject_rights_compliance", "risk_management_and_safeguards", "accountability_and_governance"]
-                }
-            }
-        }]
+        self.tools = TOOLS
+    
+    @property
+    def client(self):
+        """Process-wide pooled client, looked up per use so it survives
+        close_clients(); agents must not close it
+        """
+        return get_async_openai_client(self._api_key)
+
+    async def warm_up(self) -> None:
+        """Establish a pooled TCP/TLS connection to OpenAI with a cheap request"""
+        try:
+            await self.client.with_options(timeout=2.0).models.list()
+        except Exception as e:
+            logger.debug("OpenAI warm-up failed: %s", e)
     
     def finalize_classification(self, 
                               case_description: str,
@@ -128,15 +423,10 @@ Your goal is to gather information through natural conversation to classify a GD
         """Finalize the breach classification with the gathered information"""
         
         # Validate the classification values
-        valid_lawfulness = ["lawful_and_appropriate_basis", "lawful_but_principle_violation", "no_valid_basis", "exempt_or_restricted"]
-        valid_rights = ["full_compliance", "partial_compliance", "non_compliance", "not_triggered"]
-        valid_risk = ["proactive_safeguards", "reactive_only", "insufficient_protection", "not_applicable"]
-        valid_governance = ["fully_accountable", "partially_accountable", "not_accountable", "not_required"]
-        
-        if (lawfulness_of_processing in valid_lawfulness and
-            data_subject_rights_compliance in valid_rights and
-            risk_management_and_safeguards in valid_risk and
-            accountability_and_governance in valid_governance):
+        if (lawfulness_of_processing in VALID_LAWFULNESS and
+            data_subject_rights_compliance in VALID_RIGHTS and
+            risk_management_and_safeguards in VALID_RISK and
+            accountability_and_governance in VALID_GOVERNANCE):
             
             self.current_breach_info = BreachInfo(
                 case_description=case_description,
@@ -147,233 +437,177 @@ Your goal is to gather information through natural conversation to classify a GD
                 conversation_complete=True
             )
             
-            return f"""**Perfect! I've classified your case as follows:**
-
-**Case Description:** {case_description}
-
-**Classification Complete:**
-- **Lawfulness of Processing:** {lawfulness_of_processing}
-- **Data Subject Rights Compliance:** {data_subject_rights_compliance}  
-- **Risk Management and Safeguards:** {risk_management_and_safeguards}
-- **Accountability and Governance:** {accountability_and_governance}
-
-This classification will help with subsequent analysis and fine prediction. The case gathering is now complete and you will be redirected to the case analysis dashboard."""
+            return RESULT_TEMPLATE.format_map(asdict(self.current_breach_info))
         else:
             return "I need to gather more information. Please provide additional details about the incident so I can properly classify it."
 
-    async def start_conversation(self, initial_description: str = "") -> AsyncGenerator[str, None]:
+    async def start_conversation(self, initial_description: str = "") -> AsyncGenerator[Event, None]:
         """Start a new case gathering conversation"""
         self.current_breach_info = BreachInfo()
         
-        if initial_description:
-            message = f"I need help classifying a GDPR breach case. Here's what I know so far: {initial_description}"
-        else:
-            message = "I need help classifying a GDPR breach case. I'd like to provide information about the incident."
-        
         messages = [
-            {"role": "system", "content": self.system_instructions},
-            {"role": "user", "content": message}
+            {"role": "system", "content": SYSTEM_INSTRUCTIONS},
+            {"role": "user", "content": opening_message(initial_description)}
         ]
         
-        try:
-            stream = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                tools=self.tools,
-                stream=True,
-                temperature=0.3
-            )
+        async for event in self._consume_stream(messages, "START", 1):
+            yield event
 
-            response_text = ""
-            tool_calls = {}  # Store tool calls by ID
-            
-            async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    response_text += content
-                    yield json.dumps({"type": "message", "data": content})
-                
-                # Handle tool calls - they might come in multiple chunks
-                if chunk.choices[0].delta.tool_calls:
-                    for tool_call in chunk.choices[0].delta.tool_calls:
-                        if tool_call.id:
-                            if tool_call.id not in tool_calls:
-                                tool_calls[tool_call.id] = {
-                                    "name": "",
-                                    "arguments": ""
-                                }
-                            
-                            if tool_call.function:
-                                if tool_call.function.name:
-                                    tool_calls[tool_call.id]["name"] = tool_call.function.name
-                                if tool_call.function.arguments:
-                                    tool_calls[tool_call.id]["arguments"] += tool_call.function.arguments
-                
-                # Check if we have a complete tool call when the stream finishes
-                if chunk.choices[0].finish_reason == "tool_calls":
-                    print(f"[START] Tool calls detected: {tool_calls}")  # Debug logging
-                    for tool_call_id, tool_data in tool_calls.items():
-                        print(f"[START] Processing tool call {tool_call_id}: {tool_data}")  # Debug logging
-                        if tool_data["name"] == "finalize_classification" and tool_data["arguments"]:
-                            try:
-                                print(f"[START] Attempting to parse: {tool_data['arguments']}")  # Debug logging
-                                args = json.loads(tool_data["arguments"])
-                                self.current_breach_info = BreachInfo(**args, conversation_complete=True)
-                                yield json.dumps({
-                                    "type": "classification_complete", 
-                                    "data": self.current_breach_info.model_dump()
-                                })
-                            except json.JSONDecodeError as e:
-                                print(f"[START] JSON decode error: {e}")  # Debug logging
-                                yield json.dumps({"type": "error", "data": f"JSON parsing error: {str(e)} - Args: '{tool_data['arguments']}'"})
-                            except Exception as e:
-                                print(f"[START] Classification error: {e}")  # Debug logging
-                                yield json.dumps({"type": "error", "data": f"Classification error: {str(e)} - Args: '{tool_data['arguments']}'"})
-                        elif tool_data["name"] == "finalize_classification" and not tool_data["arguments"]:
-                            print("[START] Tool call detected but no arguments received")  # Debug logging
-                            yield json.dumps({"type": "error", "data": "Tool call detected but no arguments received"})
-            
-            # Final check for any accumulated tool calls
-            for tool_call_id, tool_data in tool_calls.items():
-                if tool_data["name"] == "finalize_classification" and tool_data["arguments"] and not self.current_breach_info.conversation_complete:
-                    try:
-                        print(f"[START-FINAL] Final attempt to parse: {tool_data['arguments']}")  # Debug logging
-                        args = json.loads(tool_data["arguments"])
-                        self.current_breach_info = BreachInfo(**args, conversation_complete=True)
-                        yield json.dumps({
-                            "type": "classification_complete", 
-                            "data": self.current_breach_info.model_dump()
-                        })
-                    except Exception as e:
-                        print(f"[START-FINAL] Final parse error: {e}")  # Debug logging
-                        yield json.dumps({"type": "error", "data": f"Final classification error: {str(e)} - Args: '{tool_data['arguments']}'"})
-                
-        except Exception as e:
-            yield json.dumps({"type": "error", "data": f"Error: {str(e)}"})
-
-    async def continue_conversation(self, messages: List[Dict[str, str]], user_response: str) -> AsyncGenerator[str, None]:
-        """Continue an existing conversation"""
+    async def continue_conversation(self, messages: List[Dict[str, str]], user_response: str,
+                                    iteration_count: int) -> AsyncGenerator[Event, None]:
+        """Continue an existing conversation
+        
+        iteration_count is the number of user replies so far, including this
+        one; the caller tracks it per conversation since the agent is shared
+        """
         # Add user response to conversation history
         messages.append({"role": "user", "content": user_response})
         
-        # Check if we need to force classification based on iteration count
-        # Count user messages that are not the initial system prompt
-        user_messages = [m for m in messages if m.get("role") == "user" and 
-                        not m.get("content", "").startswith("I need help classifying")]
-        iteration_count = len(user_messages)
-        
         # Force classification after 4 user exchanges (including the current one we just added)
-        if iteration_count >= 4:
+        if iteration_count >= MAX_ITERATIONS:
             try:
-                # Extract information from conversation history for forced classification
-                conversation_text = "\n".join([f"{m['role']}: {m['content']}" for m in messages[-8:]])  # Last 8 messages for context
+                # Start the classification of the last 8 messages, then show the preamble while it runs
+                classification_task = asyncio.create_task(self._make_forced_classification(tuple(render_transcript(messages))))
                 
-                forced_classification = self._make_forced_classification(conversation_text)
-                self.current_breach_info = BreachInfo(**forced_classification, conversation_complete=True)
+                yield ("message", "Based on our conversation, I now have enough information to classify your GDPR breach case. Let me provide the classification:\n\n")
                 
-                yield json.dumps({"type": "message", "data": "Based on our conversation, I now have enough information to classify your GDPR breach case. Let me provide the classification:\n\n"})
+                forced_classification = await classification_task
+                self.current_breach_info = BreachInfo(**forced_classification, conversation_complete=True)
                 
                 # Format the classification response
-                classification_text = f"""**Final Classification Complete:**
-
-**Lawfulness of Processing:** {forced_classification['lawfulness_of_processing']}
-**Data Subject Rights Compliance:** {forced_classification['data_subject_rights_compliance']}
-**Risk Management and Safeguards:** {forced_classification['risk_management_and_safeguards']}
-**Accountability and Governance:** {forced_classification['accountability_and_governance']}
-
-**Case Summary:** {forced_classification['case_description']}
-
-This classification is based on the information provided during our conversation. The case gathering is now complete and you will be redirected to the case analysis dashboard."""
+                classification_text = FORCED_RESULT_TEMPLATE.format_map(forced_classification)
                 
-                yield json.dumps({"type": "message", "data": classification_text})
-                yield json.dumps({
-                    "type": "classification_complete", 
-                    "data": self.current_breach_info.model_dump()
-                })
+                yield ("message", classification_text)
+                yield ("classification_complete", asdict(self.current_breach_info))
                 return
             except Exception as e:
-                yield json.dumps({"type": "error", "data": f"Forced classification error: {str(e)}"})
+                yield ("error", f"Forced classification error: {str(e)}")
                 return
         
+        async for event in self._consume_stream(messages, "CONTINUE", iteration_count + 1):
+            yield event
+
+    async def _stream_chunks(self, messages: List[Dict[str, str]], exchange: int) -> AsyncGenerator[Dict[str, Any], None]:
+        """Yield the chunks of a streamed chat completion as plain dicts.
+        The SSE lines are parsed with orjson instead of being turned into a
+        ChatCompletionChunk model each
+        """
+        async with self.client.chat.completions.with_streaming_response.create(
+            model="gpt-4o",
+            messages=[*windowed_history(messages), self.status_message(exchange)],
+            tools=self.tools,
+            stream=True,
+            temperature=0.3
+        ) as response:
+            async for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = orjson.loads(data)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"].get("message", "OpenAI stream error"))
+                yield chunk
+
+    async def _consume_stream(self, messages: List[Dict[str, str]], tag: str,
+                              exchange: int) -> AsyncGenerator[Event, None]:
+        """Stream the model's reply to messages, yielding message events and a
+        classification_complete event once finalize_classification is called.
+        The status for the given exchange is sent after the history, and the
+        reply text is appended to messages
+        """
         try:
-            stream = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                tools=self.tools,
-                stream=True,
-                temperature=0.3
-            )
-
-            response_text = ""
-            tool_calls = {}  # Store tool calls by ID
+            response_parts = []
+            tool_calls = {}  # Store tool calls by index; only the first fragment carries the id
+            buffer = []
+            buffer_chars = 0
+            last_flush = time.monotonic()
+            tool_calls_handled = False
             
-            async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    response_text += content
-                    yield json.dumps({"type": "message", "data": content})
+            async for chunk in self._stream_chunks(messages, exchange):
+                choices = chunk.get("choices")
+                if not choices:
+                    continue
+                choice = choices[0]
+                delta = choice.get("delta") or {}
+                finish_reason = choice.get("finish_reason")
+                content = delta.get("content")
+                if content:
+                    response_parts.append(content)
+                    buffer.append(content)
+                    buffer_chars += len(content)
+                
+                # Flush buffered text when it is big or old enough, and always at the end
+                if buffer and (buffer_chars >= FLUSH_CHARS or finish_reason
+                               or time.monotonic() - last_flush >= FLUSH_INTERVAL):
+                    yield ("message", "".join(buffer))
+                    buffer.clear()
+                    buffer_chars = 0
+                    last_flush = time.monotonic()
                 
                 # Handle tool calls - they might come in multiple chunks
-                if chunk.choices[0].delta.tool_calls:
-                    for tool_call in chunk.choices[0].delta.tool_calls:
-                        if tool_call.id:
-                            if tool_call.id not in tool_calls:
-                                tool_calls[tool_call.id] = {
-                                    "name": "",
-                                    "arguments": ""
-                                }
-                            
-                            if tool_call.function:
-                                if tool_call.function.name:
-                                    tool_calls[tool_call.id]["name"] = tool_call.function.name
-                                if tool_call.function.arguments:
-                                    tool_calls[tool_call.id]["arguments"] += tool_call.function.arguments
+                delta_tool_calls = delta.get("tool_calls")
+                if delta_tool_calls:
+                    for tool_call in delta_tool_calls:
+                        tool_data = tool_calls.setdefault(tool_call["index"], {"name": "", "arguments": ""})
+                        function = tool_call.get("function")
+                        if function:
+                            if function.get("name"):
+                                tool_data["name"] = function["name"]
+                            if function.get("arguments"):
+                                tool_data["arguments"] += function["arguments"]
                 
-                # Check if we have a complete tool call when the stream finishes
-                if chunk.choices[0].finish_reason == "tool_calls":
-                    print(f"[CONTINUE] Tool calls detected: {tool_calls}")  # Debug logging
+                # Check if we have a complete tool call when the stream finishes.
+                # The finish arrives on its own chunk; should it ever share one
+                # with a fragment, the pass after the loop parses the calls
+                elif finish_reason == "tool_calls":
+                    tool_calls_handled = True
+                    debug = logger.isEnabledFor(logging.DEBUG)
+                    if debug:
+                        logger.debug("[%s] Tool calls detected: %s", tag, tool_calls)
                     for tool_call_id, tool_data in tool_calls.items():
-                        print(f"[CONTINUE] Processing tool call {tool_call_id}: {tool_data}")  # Debug logging
+                        if debug:
+                            logger.debug("[%s] Processing tool call %s: %s", tag, tool_call_id, tool_data)
                         if tool_data["name"] == "finalize_classification" and tool_data["arguments"]:
                             try:
-                                print(f"[CONTINUE] Attempting to parse: {tool_data['arguments']}")  # Debug logging
-                                args = json.loads(tool_data["arguments"])
-                                self.current_breach_info = BreachInfo(**args, conversation_complete=True)
-                                yield json.dumps({
-                                    "type": "classification_complete", 
-                                    "data": self.current_breach_info.model_dump()
-                                })
-                            except json.JSONDecodeError as e:
-                                print(f"[CONTINUE] JSON decode error: {e}")  # Debug logging
-                                yield json.dumps({"type": "error", "data": f"JSON parsing error: {str(e)} - Args: '{tool_data['arguments']}'"})
+                                if debug:
+                                    logger.debug("[%s] Attempting to parse: %s", tag, tool_data['arguments'])
+                                self.current_breach_info = BreachInfo.completed(tool_data["arguments"])
+                                yield ("classification_complete", asdict(self.current_breach_info))
+                            except ValidationError as e:
+                                logger.warning("[%s] Invalid tool arguments: %s", tag, e)
+                                yield ("error", f"Invalid classification arguments: {str(e)} - Args: '{tool_data['arguments']}'")
                             except Exception as e:
-                                print(f"[CONTINUE] Classification error: {e}")  # Debug logging
-                                yield json.dumps({"type": "error", "data": f"Classification error: {str(e)} - Args: '{tool_data['arguments']}'"})
+                                logger.warning("[%s] Classification error: %s", tag, e)
+                                yield ("error", f"Classification error: {str(e)} - Args: '{tool_data['arguments']}'")
                         elif tool_data["name"] == "finalize_classification" and not tool_data["arguments"]:
-                            print("[CONTINUE] Tool call detected but no arguments received")  # Debug logging
-                            yield json.dumps({"type": "error", "data": "Tool call detected but no arguments received"})
+                            logger.warning("[%s] Tool call detected but no arguments received", tag)
+                            yield ("error", "Tool call detected but no arguments received")
+            
+            if buffer:
+                yield ("message", "".join(buffer))
             
-            # Final check for any accumulated tool calls
-            for tool_call_id, tool_data in tool_calls.items():
-                if tool_data["name"] == "finalize_classification" and tool_data["arguments"] and not self.current_breach_info.conversation_complete:
-                    try:
-                        print(f"[CONTINUE-FINAL] Final attempt to parse: {tool_data['arguments']}")  # Debug logging
-                        args = json.loads(tool_data["arguments"])
-                        self.current_breach_info = BreachInfo(**args, conversation_complete=True)
-                        yield json.dumps({
-                            "type": "classification_complete", 
-                            "data": self.current_breach_info.model_dump()
-                        })
-                    except Exception as e:
-                        print(f"[CONTINUE-FINAL] Final parse error: {e}")  # Debug logging
-                        yield json.dumps({"type": "error", "data": f"Final classification error: {str(e)} - Args: '{tool_data['arguments']}'"})
+            # Streams that ended without a tool_calls finish_reason still get their calls parsed
+            if not tool_calls_handled:
+                for tool_call_id, tool_data in tool_calls.items():
+                    if tool_data["name"] == "finalize_classification" and tool_data["arguments"] and not self.current_breach_info.conversation_complete:
+                        try:
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("[%s-FINAL] Final attempt to parse: %s", tag, tool_data['arguments'])
+                            self.current_breach_info = BreachInfo.completed(tool_data["arguments"])
+                            yield ("classification_complete", asdict(self.current_breach_info))
+                        except Exception as e:
+                            logger.warning("[%s-FINAL] Final parse error: %s", tag, e)
+                            yield ("error", f"Final classification error: {str(e)} - Args: '{tool_data['arguments']}'")
             
             # Add assistant response to conversation history
+            response_text = "".join(response_parts)
             if response_text:
                 messages.append({"role": "assistant", "content": response_text})
                 
         except Exception as e:
-            yield json.dumps({"type": "error", "data": f"Error: {str(e)}"})
+            yield ("error", f"Error: {str(e)}")
 
     def get_current_classification(self) -> Optional[BreachInfo]:
         """Get the current breach classification if complete"""
@@ -386,111 +620,58 @@ This classification is based on the information provided during our conversation
         # Reset the breach info for the next conversation
         self.current_breach_info = BreachInfo()
 
-    def get_system_instructions_with_context(self, iteration_count: int) -> str:
-        """Get system instructions with current iteration context"""
-        max_iterations = 4
-        context = f"\n\n**Current Status:** This is exchange {iteration_count}/{max_iterations} maximum."
-        
-        if iteration_count >= max_iterations:
-            context += " **IMPORTANT: This is the final exchange. You MUST call the finalize_classification function now with your best assessment based on available information. Do not ask more questions.**"
-        elif iteration_count == max_iterations - 1:
-            context += " **WARNING: This is the second-to-last exchange. After the user's next response, you must classify immediately.**"
-        else:
-            context += " Gather key information efficiently. Remember to call finalize_classification when you have sufficient information."
-            
-        return self.system_instructions + context
+    def status_message(self, iteration_count: int) -> Dict[str, str]:
+        """Trailing system message telling the model which exchange this is"""
+        if 0 <= iteration_count < len(_STATUS_MESSAGES):
+            return _STATUS_MESSAGES[iteration_count]
+        return {"role": "system", "content": _context_suffix(iteration_count).strip()}
     
-    async def _make_forced_classification(self, conversation_text: str) -> dict:
+    async def _make_forced_classification(self, transcript: Sequence[str]) -> dict:
         """Make a classification based on conversation history using OpenAI structured output"""
+        # Clear-cut conversations don't need the model
+        classification_data, confidence = quick_classify(transcript)
+        if confidence > RULE_CONFIDENCE_THRESHOLD:
+            return classification_data
+        
+        conversation_text = "\n".join(transcript)
+        normalized = " ".join(conversation_text.lower().split())
+        cache_key = make_cache_key(conversation=normalized, model=CLASSIFICATION_MODEL)
+        cached = self._classification_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        # Similar conversations only share the four labels; the description is
+        # always this conversation's own, so no other user's account leaks in
+        embedding = await self._embed(normalized)
+        if embedding is not None:
+            payload = self._semantic_cache.lookup(embedding)
+            if payload is not None:
+                classification_data = {"case_description": describe_case(transcript), **orjson.loads(payload)}
+                self._classification_cache.set(cache_key, classification_data)
+                return dict(classification_data)
+        
         try:
-            # Create a prompt for classification analysis
-            classification_prompt = f"""
-            Based on the following conversation about a GDPR breach incident, please provide a comprehensive classification across the 4 key dimensions.
-
-            Conversation History:
-            {conversation_text}
-
-            Please analyze the conversation and classify the breach case across these dimensions:
-
-            1. **Lawfulness of Processing** - Choose one:
-               - lawful_and_appropriate_basis: Processing had clear legal basis and was appropriate
-               - lawful_but_principle_violation: Legal basis existed but violated GDPR principles
-               - no_valid_basis: No valid legal basis for processing
-               - exempt_or_restricted: Processing was exempt from GDPR or had restricted applicability
-
-            2. **Data Subject Rights Compliance** - Choose one:
-               - full_compliance: All relevant data subject rights were properly handled
-               - partial_compliance: Some rights were handled but with deficiencies
-               - non_compliance: Failed to respect data subject rights
-               - not_triggered: No data subject rights were triggered in this case
-
-            3. **Risk Management and Safeguards** - Choose one:
-               - proactive_safeguards: Had comprehensive preventive security measures
-               - reactive_only: Only responded after incident occurred
-               - insufficient_protection: Inadequate security measures in place
-               - not_applicable: Risk management not relevant to this case
-
-            4. **Accountability and Governance** - Choose one:
-               - fully_accountable: Complete documentation, policies, and governance
-               - partially_accountable: Some accountability measures but gaps exist
-               - not_accountable: Failed to demonstrate compliance accountability
-               - not_required: Accountability requirements didn't apply
-
-            Provide a comprehensive case description summarizing the incident and your classification rationale.
-            """
-
             # Use OpenAI with structured output to ensure proper formatting
             response = await self.client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
+                model=CLASSIFICATION_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are an expert GDPR case analysis assistant. Analyze the conversation history and provide a structured classification of the breach incident based on the 4 key dimensions. Make reasonable inferences where information is incomplete."},
-                    {"role": "user", "content": classification_prompt}
+                    {"role": "system", "content": CLASSIFICATION_SYSTEM_PROMPT},
+                    {"role": "user", "content": CLASSIFICATION_PROMPT_TEMPLATE.format(conversation_text=conversation_text)}
                 ],
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "breach_classification",
-                        "schema": {
-                            "type": "object",
-                            "properties": {
-                                "case_description": {
-                                    "type": "string",
-                                    "description": "Complete description of the breach case based on conversation"
-                                },
-                                "lawfulness_of_processing": {
-                                    "type": "string",
-                                    "enum": ["lawful_and_appropriate_basis", "lawful_but_principle_violation", "no_valid_basis", "exempt_or_restricted"],
-                                    "description": "Classification for lawfulness of processing"
-                                },
-                                "data_subject_rights_compliance": {
-                                    "type": "string", 
-                                    "enum": ["full_compliance", "partial_compliance", "non_compliance", "not_triggered"],
-                                    "description": "Classification for data subject rights compliance"
-                                },
-                                "risk_management_and_safeguards": {
-                                    "type": "string",
-                                    "enum": ["proactive_safeguards", "reactive_only", "insufficient_protection", "not_applicable"],
-                                    "description": "Classification for risk management and safeguards"
-                                },
-                                "accountability_and_governance": {
-                                    "type": "string",
-                                    "enum": ["fully_accountable", "partially_accountable", "not_accountable", "not_required"],
-                                    "description": "Classification for accountability and governance"
-                                }
-                            },
-                            "required": ["case_description", "lawfulness_of_processing", "data_subject_rights_compliance", "risk_management_and_safeguards", "accountability_and_governance"],
-                            "additionalProperties": False
-                        }
-                    }
-                }
+                response_format=CLASSIFICATION_RESPONSE_FORMAT
             )
             
             # Parse the structured response
-            classification_data = json.loads(response.choices[0].message.content)
-            return classification_data
+            content = response.choices[0].message.content
+            classification_data = orjson.loads(content)
+            self._classification_cache.set(cache_key, classification_data)
+            if embedding is not None:
+                labels = {dimension: classification_data[dimension] for dimension in CLASSIFICATION_DIMENSIONS}
+                self._semantic_cache.add(embedding, orjson.dumps(labels).decode())
+            return dict(classification_data)
             
         except Exception as e:
-            print(f"Error in forced classification: {e}")
+            logger.warning("Error in forced classification: %s", e)
             # Fallback to simple classification
             return {
                 "case_description": "Data breach incident based on conversation history",
@@ -499,3 +680,11 @@ This classification is based on the information provided during our conversation
                 "risk_management_and_safeguards": "insufficient_protection",
                 "accountability_and_governance": "partially_accountable"
             }
+    
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        """Embed text for the semantic cache; None disables the lookup"""
+        try:
+            response = await self.client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+            return response.data[0].embedding
+        except Exception:
+            return None
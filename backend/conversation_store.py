@@ -0,0 +1,143 @@
+"""
+Conversation state for the case-gathering endpoints.
+
+Each conversation has a message list, an exchange counter and, once the
+case is classified, its classification. With REDIS_URL set they live in
+Redis as ``conv:{id}:messages`` (a list with one JSON message per entry),
+``conv:{id}:iter`` (INCR'd per exchange, so concurrent requests can't race
+on it) and ``conv:{id}:cls`` (JSON). That way every Uvicorn worker sees the
+same conversations. Every write refreshes a TTL, so abandoned conversations
+expire on their own. Without REDIS_URL, an in-process store with the same
+interface is used, which is enough for a single worker in development.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+CONVERSATION_TTL = 3600  # seconds an idle conversation is kept
+
+Snapshot = Tuple[List[Dict[str, str]], int, Optional[Dict[str, Any]]]
+
+
+class RedisConversationStore:
+    """Conversation state shared by all workers through Redis"""
+
+    def __init__(self, url: str, ttl: int = CONVERSATION_TTL):
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url)
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(conversation_id: str) -> Tuple[str, str, str]:
+        prefix = f"conv:{conversation_id}"
+        return f"{prefix}:messages", f"{prefix}:iter", f"{prefix}:cls"
+
+    async def create(self, conversation_id: str, messages: List[Dict[str, str]]) -> None:
+        """Start (or restart) a conversation at exchange 1"""
+        messages_key, iter_key, cls_key = self._keys(conversation_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(messages_key, cls_key)
+            pipe.rpush(messages_key, *(orjson.dumps(message) for message in messages))
+            pipe.set(iter_key, 1, ex=self.ttl)
+            pipe.expire(messages_key, self.ttl)
+            await pipe.execute()
+
+    async def load(self, conversation_id: str) -> Optional[Snapshot]:
+        """Return (messages, exchange, classification) in one round trip, or None if unknown"""
+        messages_key, iter_key, cls_key = self._keys(conversation_id)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.lrange(messages_key, 0, -1)
+            pipe.get(iter_key)
+            pipe.get(cls_key)
+            raw_messages, iteration, classification = await pipe.execute()
+        if not raw_messages:
+            return None
+        return (
+            [orjson.loads(message) for message in raw_messages],
+            int(iteration or 1),
+            orjson.loads(classification) if classification else None,
+        )
+
+    async def next_iteration(self, conversation_id: str) -> int:
+        """Atomically advance the exchange counter and return the new value"""
+        messages_key, iter_key, cls_key = self._keys(conversation_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(iter_key)
+            pipe.expire(iter_key, self.ttl)
+            pipe.expire(messages_key, self.ttl)
+            pipe.expire(cls_key, self.ttl)
+            iteration, *_ = await pipe.execute()
+        return iteration
+
+    async def append(self, conversation_id: str, messages: List[Dict[str, str]]) -> None:
+        if not messages:
+            return
+        messages_key, _, _ = self._keys(conversation_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(messages_key, *(orjson.dumps(message) for message in messages))
+            pipe.expire(messages_key, self.ttl)
+            await pipe.execute()
+
+    async def set_classification(self, conversation_id: str, classification: Dict[str, Any]) -> None:
+        _, _, cls_key = self._keys(conversation_id)
+        await self._redis.set(cls_key, orjson.dumps(classification), ex=self.ttl)
+
+    async def delete(self, conversation_id: str) -> bool:
+        """Drop a conversation; False if it didn't exist"""
+        messages_key, iter_key, cls_key = self._keys(conversation_id)
+        return await self._redis.delete(messages_key, iter_key, cls_key) > 0
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class MemoryConversationStore:
+    """In-process stand-in for RedisConversationStore (single worker only)"""
+
+    def __init__(self):
+        self._messages: Dict[str, List[Dict[str, str]]] = {}
+        self._iterations: Dict[str, int] = {}
+        self._classifications: Dict[str, Dict[str, Any]] = {}
+
+    async def create(self, conversation_id: str, messages: List[Dict[str, str]]) -> None:
+        self._messages[conversation_id] = list(messages)
+        self._iterations[conversation_id] = 1
+        self._classifications.pop(conversation_id, None)
+
+    async def load(self, conversation_id: str) -> Optional[Snapshot]:
+        messages = self._messages.get(conversation_id)
+        if messages is None:
+            return None
+        return (
+            list(messages),
+            self._iterations.get(conversation_id, 1),
+            self._classifications.get(conversation_id),
+        )
+
+    async def next_iteration(self, conversation_id: str) -> int:
+        iteration = self._iterations.get(conversation_id, 0) + 1
+        self._iterations[conversation_id] = iteration
+        return iteration
+
+    async def append(self, conversation_id: str, messages: List[Dict[str, str]]) -> None:
+        self._messages.setdefault(conversation_id, []).extend(messages)
+
+    async def set_classification(self, conversation_id: str, classification: Dict[str, Any]) -> None:
+        self._classifications[conversation_id] = classification
+
+    async def delete(self, conversation_id: str) -> bool:
+        self._iterations.pop(conversation_id, None)
+        self._classifications.pop(conversation_id, None)
+        return self._messages.pop(conversation_id, None) is not None
+
+    async def close(self) -> None:
+        pass
+
+
+def create_conversation_store(redis_url: Optional[str] = None):
+    """Redis-backed store when a URL is given, otherwise the in-process one"""
+    if redis_url:
+        return RedisConversationStore(redis_url)
+    return MemoryConversationStore()
@@ -1,37 +1,201 @@
+import asyncio
+import logging
 import os
-from openai import OpenAI
-from models import GdprParagraphList
+import uuid
+import orjson
+from cachetools import TTLCache
+from backend.models import GdprParagraphList
+from backend.openai_clients import get_async_openai_client
+from backend.llm_cache import ResponseCache, SemanticCache, make_cache_key
 
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+EVALUATION_MODEL = "gpt-4o-2024-08-06"
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Upper bound on evaluation requests in flight against OpenAI
+MAX_CONCURRENT_REQUESTS = 64
+# Of those, how many may come from queued (non-interactive) jobs
+MAX_CONCURRENT_JOBS = 16
+# The SDK retries 429s and 5xx with exponential backoff and jitter
+MAX_RETRIES = 5
+
+# Read once at import; ARTICLES_TO_CHECK overrides the default article list
+ARTICLES = os.getenv("ARTICLES_TO_CHECK") or "Art. 5, 6, 10, 13, 17, 25 , 32, 33, 34, 35 and 44 of the GDPR"
+SYSTEM_PROMPT = "You are an GDPR Expert that can help asses the risk of data breaches."
+EVALUATION_TOOLS = [{
+    "type": "web_search_preview",
+    "search_context_size": "low",
+}]
+PROMPT_TEMPLATE = "Our company had a data breach. Here's what happend: {case_description}. Please calculate the probability of us violating the following GDPR articles: " + ARTICLES + " and the approximate fine that we can expect. For each paragraph, assign the fitting classificcation. "
+
+
+def _event(event_type, data):
+    """Serialize a stream event with orjson"""
+    return orjson.dumps({"type": event_type, "data": data}).decode()
+
+
 class EvaluationService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache_size=1000, cache_ttl=3600, semantic_threshold=0.92):
         if not api_key:
             raise ValueError("OpenAI API key is not provided.")
-        self.openai = OpenAI(api_key=api_key)
+        self._api_key = api_key
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._job_slots = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+        # Queued evaluations by job id: running ones are held until they finish,
+        # then move to a cache where they expire
+        self._pending_jobs = {}
+        self._jobs = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # Identical case descriptions are answered from memory instead of OpenAI
+        self._cache = ResponseCache(maxsize=cache_size, ttl=cache_ttl)
+        # Paraphrased descriptions are matched by embedding similarity
+        self._semantic_cache = SemanticCache(
+            threshold=semantic_threshold,
+            path=os.getenv("SEMANTIC_CACHE_DIR"),
+            maxsize=cache_size,
+        )
+        # Evaluations currently running, keyed like the response cache
+        self._inflight = {}
+
+
+    @property
+    def openai(self):
+        """The shared client, looked up per use so it survives close_clients()"""
+        return get_async_openai_client(self._api_key, max_retries=MAX_RETRIES)
+
+    async def get_evaluation(self, case_description, use_cache=True):
+        """Evaluate a case; use_cache=False skips both cache tiers and refreshes the exact one"""
+
+        cache_key = make_cache_key(desc=case_description, model=EVALUATION_MODEL, articles=ARTICLES)
+        if not use_cache:
+            return await self._evaluate(case_description, cache_key, use_cache=False)
+        # Concurrent requests for the same case share one OpenAI call
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._evaluate(case_description, cache_key))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        # Shielded so one disconnecting caller doesn't cancel the others' call
+        return await asyncio.shield(task)
+
+    def submit(self, case_description):
+        """Queue an evaluation in the background and return its job id"""
+        job_id = uuid.uuid4().hex
+        task = asyncio.ensure_future(self._run_job(case_description))
+        self._pending_jobs[job_id] = task
+        task.add_done_callback(lambda done: self._finish_job(job_id, done))
+        return job_id
+
+    def _finish_job(self, job_id, task):
+        self._pending_jobs.pop(job_id, None)
+        self._jobs[job_id] = task
+
+    def get_job(self, job_id):
+        """Return the task of a queued evaluation, or None if unknown or expired"""
+        return self._pending_jobs.get(job_id) or self._jobs.get(job_id)
+
+    async def _run_job(self, case_description):
+        # Jobs take at most MAX_CONCURRENT_JOBS of the request slots, so
+        # bursts of queued work leave room for interactive requests
+        async with self._job_slots:
+            return await self.get_evaluation(case_description)
 
+    async def _evaluate(self, case_description, cache_key, use_cache=True):
 
-    def get_evaluation(self, case_description):
+        embedding, cached = await self._lookup(case_description, cache_key) if use_cache else (None, None)
+        if cached is not None:
+            return cached
 
-        articles ="Art. 5, 6, 10, 13, 17, 25 , 32, 33, 34, 35 and 44 of the GDPR"
         try:
-            prompt = f"""Our company had a data breach. Here's what happend: {case_description}. Please calculate the probability of us violating the following GDPR articles: {articles} and the approximate fine that we can expect. For each paragraph, assign the fitting classificcation. """
-
-            response = self.openai.responses.parse(
-                model="gpt-4o-2024-08-06",
-                tools=[{
-                    "type": "web_search_preview",
-                    "search_context_size": "low",
-                }],
-                input=[
-                    {"role": "system", "content": "You are an GDPR Expert that can help asses the risk of data breaches."},
-                    {"role": "user", "content": prompt}
-                ],
-                text_format=GdprParagraphList,
-            )
+            async with self._semaphore:
+                response = await self.openai.responses.parse(
+                    model=EVALUATION_MODEL,
+                    tools=EVALUATION_TOOLS,
+                    input=self._build_input(case_description),
+                    text_format=GdprParagraphList,
+                )
+            self._store(cache_key, embedding, response.output_parsed)
             return response.output_parsed
 
+        except Exception:
+            logger.exception("Evaluation request to OpenAI failed")
+            return None
+
+    async def get_evaluation_stream(self, case_description, use_cache=True):
+        """Yield JSON events: text deltas while the model writes, then the parsed result"""
+
+        cache_key = make_cache_key(desc=case_description, model=EVALUATION_MODEL, articles=ARTICLES)
+        embedding, cached = await self._lookup(case_description, cache_key) if use_cache else (None, None)
+        if cached is not None:
+            yield _event("evaluation_complete", cached.model_dump())
+            return
+
+        try:
+            async with self._semaphore:
+                async with self.openai.responses.stream(
+                    model=EVALUATION_MODEL,
+                    tools=EVALUATION_TOOLS,
+                    input=self._build_input(case_description),
+                    text_format=GdprParagraphList,
+                ) as stream:
+                    async for event in stream:
+                        if event.type == "response.output_text.delta":
+                            yield _event("delta", event.delta)
+                    response = await stream.get_final_response()
+
+            result = response.output_parsed
+            self._store(cache_key, embedding, result)
+            if result is None:
+                yield _event("error", "Failed to parse case evaluation")
+            else:
+                yield _event("evaluation_complete", result.model_dump())
+
+        except Exception:
+            logger.exception("Streaming evaluation request to OpenAI failed")
+            yield _event("error", "Failed to get case evaluation from OpenAI API")
+
+    @staticmethod
+    def _build_input(case_description):
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": PROMPT_TEMPLATE.format(case_description=case_description)}
+        ]
+
+    async def _lookup(self, case_description, cache_key):
+        """Check both cache tiers; returns (embedding, cached result or None)"""
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return None, cached
+
+        embedding = await self._embed(case_description)
+        if embedding is not None:
+            payload = self._semantic_cache.lookup(embedding)
+            if payload is not None:
+                result = GdprParagraphList.model_validate_json(payload)
+                self._cache.set(cache_key, result)
+                return embedding, result
+        return embedding, None
+
+    def _store(self, cache_key, embedding, result):
+        if result is None:
+            return
+        self._cache.set(cache_key, result)
+        if embedding is not None:
+            self._semantic_cache.add(embedding, result.model_dump_json())
+
+    async def _embed(self, text):
+        """Embed text for the semantic cache; None disables the lookup"""
+        try:
+            async with self._semaphore:
+                response = await self.openai.embeddings.create(model=EMBEDDING_MODEL, input=text)
+            return response.data[0].embedding
         except Exception as e:
-            print(f"An error occured")
-            return None
\ No newline at end of file
+            logger.warning("Embedding request failed, skipping the semantic cache: %s", e)
+            return None
+
+    def reset(self):
+        """Clear the response caches (used by tests)"""
+        self._cache.reset()
+        self._semantic_cache.reset()
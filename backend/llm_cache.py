@@ -0,0 +1,167 @@
+"""
+In-process caches for OpenAI responses.
+
+Responses are keyed by a SHA-256 digest of everything that influences the
+completion (model, prompt inputs, ...), so repeated requests are answered from
+memory instead of paying for another round trip to the API.
+
+SemanticCache is a second tier for paraphrased inputs: it compares the
+embedding of a new input against the embeddings of previously answered ones
+and returns the stored response when they are close enough.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+
+def make_cache_key(**parts: Any) -> str:
+    """Build a stable SHA-256 cache key from the given request parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """TTL + LRU cache for LLM responses that tracks hits and misses"""
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        value = self._cache.get(key)
+        if value is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value; the least recently used entry is evicted when full"""
+        self._cache[key] = value
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self._hits, "misses": self._misses, "size": len(self._cache)}
+
+    def reset(self) -> None:
+        """Drop all entries and zero the counters"""
+        self._cache.clear()
+        self._hits = 0
+        self._misses = 0
+
+
+class SemanticCache:
+    """Embedding-similarity cache mapping inputs to serialized responses
+
+    Embeddings are L2-normalized and kept in one preallocated float32 matrix,
+    so a lookup is a single matrix-vector product. Payloads are strings
+    (usually ``model_dump_json()`` output). At most ``maxsize`` entries are
+    kept; when full, the oldest quarter is dropped. When ``path`` is given the
+    cache is loaded from and appended to ``<path>/embeddings.f32`` (raw
+    float32 rows) and ``<path>/payloads.jsonl``.
+    """
+
+    def __init__(self, threshold: float = 0.9, dim: int = 1536, path: Optional[str] = None,
+                 maxsize: int = 10000):
+        self.threshold = threshold
+        self.path = path
+        self.maxsize = maxsize
+        self._matrix = np.empty((min(64, maxsize), dim), dtype=np.float32)
+        self._payloads: List[str] = []
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: Sequence[float]) -> Optional[str]:
+        """Return the payload of the most similar entry above the threshold"""
+        if not self._payloads:
+            return None
+        scores = self._matrix[:len(self._payloads)] @ self._normalize(embedding)
+        best = int(scores.argmax())
+        if scores[best] >= self.threshold:
+            return self._payloads[best]
+        return None
+
+    def add(self, embedding: Sequence[float], payload: str) -> None:
+        """Store a payload under its embedding, growing the matrix by doubling
+        up to maxsize and evicting the oldest entries beyond that
+        """
+        vector = self._normalize(embedding)
+        if len(self._payloads) == self.maxsize:
+            self._evict(max(1, self.maxsize // 4))
+        size = len(self._payloads)
+        if size == self._matrix.shape[0]:
+            grown = np.empty((min(size * 2, self.maxsize), self._matrix.shape[1]), dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+        self._matrix[size] = vector
+        self._payloads.append(payload)
+        if self.path:
+            self._append(vector, payload)
+
+    def reset(self) -> None:
+        """Drop all entries, including the persisted ones"""
+        self._payloads = []
+        if self.path:
+            self._rewrite()
+
+    def _evict(self, count: int) -> None:
+        """Drop the count oldest entries"""
+        size = len(self._payloads)
+        self._matrix[:size - count] = self._matrix[count:size]
+        self._payloads = self._payloads[count:]
+        if self.path:
+            self._rewrite()
+
+    def _files(self) -> Tuple[str, str]:
+        return (os.path.join(self.path, "embeddings.f32"),
+                os.path.join(self.path, "payloads.jsonl"))
+
+    def _load(self) -> None:
+        matrix_file, payload_file = self._files()
+        if not (os.path.isfile(matrix_file) and os.path.isfile(payload_file)):
+            return
+        with open(payload_file, encoding="utf-8") as f:
+            payloads = [json.loads(line) for line in f if line.strip()]
+        matrix = np.fromfile(matrix_file, dtype=np.float32)
+        matrix = matrix[:matrix.size - matrix.size % self._matrix.shape[1]].reshape(-1, self._matrix.shape[1])
+        count = min(len(payloads), matrix.shape[0])
+        keep = min(count, self.maxsize)
+        self._matrix = np.empty((min(max(64, keep * 2), self.maxsize), matrix.shape[1]), dtype=np.float32)
+        self._matrix[:keep] = matrix[count - keep:count]
+        self._payloads = payloads[count - keep:count]
+        if keep != len(payloads) or keep != matrix.shape[0]:
+            # Drop rows that were evicted or half-written
+            self._rewrite()
+
+    def _append(self, vector: np.ndarray, payload: str) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        matrix_file, payload_file = self._files()
+        with open(payload_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload) + "\n")
+        with open(matrix_file, "ab") as f:
+            vector.tofile(f)
+
+    def _rewrite(self) -> None:
+        """Persist exactly the in-memory entries, replacing the files"""
+        os.makedirs(self.path, exist_ok=True)
+        matrix_file, payload_file = self._files()
+        with open(payload_file, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(payload) + "\n" for payload in self._payloads)
+        with open(matrix_file, "wb") as f:
+            self._matrix[:len(self._payloads)].tofile(f)
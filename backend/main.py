@@ -1,33 +1,63 @@
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from evaluation_service import EvaluationService
-from case_gathering_agent import CaseGatheringAgent
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from backend.evaluation_service import EvaluationService
+from backend.case_gathering_agent import CaseGatheringAgent
+from pydantic import BaseModel, ValidationError
+from sse_starlette.sse import EventSourceResponse, ServerSentEvent
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+import asyncio
 import os
-import json
-import sys
+import logging
+import orjson
+import hashlib
+import uuid
 import uvicorn
 import re
 from dotenv import load_dotenv
-import openai
-from case_gathering_agent import BreachInfo
-
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.openai_clients import close_clients, get_async_openai_client
+from backend.case_gathering_agent import (
+    CLASSIFICATION_MODEL, GOVERNANCE_VALUES, LAWFULNESS_VALUES, RIGHTS_VALUES,
+    RISK_VALUES, SYSTEM_INSTRUCTIONS, opening_message,
+)
+from backend.conversation_store import create_conversation_store
+from backend.models import BreachClassification
 
 load_dotenv()
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# Imported once at startup; the prediction endpoints degrade gracefully
+# when the workflow's dependencies aren't installed
+try:
+    from backend.breach_impact_workflow import predict_breach_impact, predict_breach_impact_stream
+    WORKFLOW_IMPORT_ERROR = None
+except ImportError as e:
+    logger.warning("Breach impact workflow unavailable: %s", e)
+    predict_breach_impact = predict_breach_impact_stream = None
+    WORKFLOW_IMPORT_ERROR = e
 
 evaluation_service = EvaluationService(api_key=os.getenv("OPENAI_API_KEY"))
 case_gathering_agent = CaseGatheringAgent(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Store active conversations (in production, use Redis or database)
-active_conversations: Dict[str, List[Dict[str, str]]] = {}
-conversation_iterations: Dict[str, int] = {}  # Track iteration count per conversation
-conversation_classifications: Dict[str, Any] = {}  # Store classifications per conversation
+# Conversation messages, exchange counts and classifications; kept in Redis
+# when REDIS_URL is set so all workers share them, in-process otherwise
+conversation_store = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global conversation_store
+    conversation_store = create_conversation_store(os.getenv("REDIS_URL"))
+    # The agent is created at import, before the event loop runs
+    await case_gathering_agent.warm_up()
+    yield
+    await conversation_store.close()
+    await close_clients()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Allow all CORS
 app.add_middleware(
@@ -39,6 +69,39 @@ app.add_middleware(
 )
 
 
+SSE_PING_INTERVAL = 15  # seconds between keep-alive comments, so proxies don't time out long generations
+
+
+def event_stream(events) -> EventSourceResponse:
+    """Serve events as SSE; sse-starlette sets the no-cache and no-buffering headers"""
+    return EventSourceResponse(events, ping=SSE_PING_INTERVAL, sep="\n")
+
+
+def agent_event(event_type: str, data: Any) -> ServerSentEvent:
+    """Serialize a case-gathering event in the frontend's {type, data} shape"""
+    return ServerSentEvent(data=orjson.dumps({'type': event_type, 'data': data}).decode())
+
+
+STREAM_END_DATA = orjson.dumps({'type': 'stream_end'}).decode()
+
+
+def stream_end() -> ServerSentEvent:
+    # The frontend reads the type from data; the event name is for EventSource clients
+    return ServerSentEvent(data=STREAM_END_DATA, event="end")
+
+
+# The valid classification values never change at runtime, so the response
+# is serialized once and clients can revalidate it with If-None-Match
+BREACH_CLASSIFICATIONS_JSON = orjson.dumps({
+    "lawfulness_of_processing": LAWFULNESS_VALUES,
+    "data_subject_rights_compliance": RIGHTS_VALUES,
+    "risk_management_and_safeguards": RISK_VALUES,
+    "accountability_and_governance": GOVERNANCE_VALUES,
+})
+BREACH_CLASSIFICATIONS_ETAG = '"' + hashlib.sha256(BREACH_CLASSIFICATIONS_JSON).hexdigest()[:16] + '"'
+BREACH_CLASSIFICATIONS_HEADERS = {"Cache-Control": "public, max-age=86400", "ETag": BREACH_CLASSIFICATIONS_ETAG}
+
+
 class StartConversationRequest(BaseModel):
     initial_description: Optional[str] = ""
     conversation_id: Optional[str] = None
@@ -49,155 +112,181 @@ class ContinueConversationRequest(BaseModel):
     user_response: str
 
 
+class EvaluateRequest(BaseModel):
+    case_description: str
+
+
+class BreachImpactRequest(BaseModel):
+    case_description: str
+    lawfulness_of_processing: str
+    data_subject_rights_compliance: str
+    risk_management_and_safeguards: str
+    accountability_and_governance: str
+
+
+async def parse_body(request: Request, model):
+    """Validate the JSON body straight from bytes with pydantic-core.
+
+    Returns (payload, None), or (None, a 400 response naming the problem);
+    the endpoints answer 400 rather than FastAPI's 422 for bad bodies
+    """
+    try:
+        return model.model_validate_json(await request.body()), None
+    except ValidationError as e:
+        errors = e.errors()
+        missing = [".".join(map(str, error["loc"])) for error in errors if error["type"] == "missing"]
+        if missing:
+            message = f"Missing required field: {', '.join(missing)}"
+        else:
+            message = f"Invalid request body: {errors[0]['msg']}"
+        return None, ORJSONResponse(status_code=400, content={"error": message})
+
+
 @app.post("/api/start-case-gathering")
 async def start_case_gathering(request: StartConversationRequest):
     """Start a new case gathering conversation with streaming responses"""
     
-    import uuid
-    conversation_id = request.conversation_id or str(uuid.uuid4())
-    
-    # Initialize conversation with system message and iteration tracking
-    conversation_iterations[conversation_id] = 1
-    system_instructions_with_context = case_gathering_agent.get_system_instructions_with_context(1)
+    conversation_id = request.conversation_id or uuid.uuid4().hex
     
-    active_conversations[conversation_id] = [
-        {"role": "system", "content": system_instructions_with_context}
+    # The instructions never change, so OpenAI can cache them together with
+    # the history; the agent sends the per-exchange status after the history
+    messages = [
+        {"role": "system", "content": SYSTEM_INSTRUCTIONS},
+        {"role": "user", "content": opening_message(request.initial_description)},
     ]
-    
-    if request.initial_description:
-        active_conversations[conversation_id].append({
-            "role": "user", 
-            "content": f"I need help classifying a GDPR breach case. Here's what I know so far: {request.initial_description}"
-        })
-    else:
-        active_conversations[conversation_id].append({
-            "role": "user", 
-            "content": "I need help classifying a GDPR breach case. I'd like to provide information about the incident."
-        })
+    # Stored at exchange 1
+    await conversation_store.create(conversation_id, messages)
 
     async def generate_stream():
-        yield f"data: {json.dumps({'type': 'conversation_id', 'data': conversation_id})}\n\n"
+        yield agent_event('conversation_id', conversation_id)
         
-        async for chunk in case_gathering_agent.start_conversation(request.initial_description):
+        async for event_type, data in case_gathering_agent.start_conversation(request.initial_description):
             # Store classification if received
-            try:
-                chunk_data = json.loads(chunk)
-                if chunk_data.get('type') == 'classification_complete' and chunk_data.get('data'):
-                    conversation_classifications[conversation_id] = chunk_data['data']
-            except:
-                pass  # Ignore parsing errors for non-JSON chunks
+            if event_type == 'classification_complete' and data:
+                await conversation_store.set_classification(conversation_id, data)
                 
-            yield f"data: {chunk}\n\n"
+            yield agent_event(event_type, data)
         
-        yield f"data: {json.dumps({'type': 'stream_end'})}\n\n"
-
-    return StreamingResponse(
-        generate_stream(), 
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "*",
-        }
-    )
+        yield stream_end()
+
+    return event_stream(generate_stream())
 
 
 @app.post("/api/continue-case-gathering")
 async def continue_case_gathering(request: ContinueConversationRequest):
     """Continue an existing case gathering conversation"""
     
-    if request.conversation_id not in active_conversations:
-        return JSONResponse(
+    snapshot = await conversation_store.load(request.conversation_id)
+    if snapshot is None:
+        return ORJSONResponse(
             status_code=404, 
             content={"error": "Conversation not found"}
         )
+    messages, _, _ = snapshot
     
-    # Increment iteration count
-    if request.conversation_id not in conversation_iterations:
-        conversation_iterations[request.conversation_id] = 1
-    conversation_iterations[request.conversation_id] += 1
-    
-    current_iteration = conversation_iterations[request.conversation_id]
-    
-    messages = active_conversations[request.conversation_id]
-    
-    # Update system message with new iteration context
-    system_instructions_with_context = case_gathering_agent.get_system_instructions_with_context(current_iteration)
-    messages[0] = {"role": "system", "content": system_instructions_with_context}
+    # Atomic, so concurrent requests for one conversation can't both see the same count
+    current_iteration = await conversation_store.next_iteration(request.conversation_id)
     
     async def generate_stream():
-        async for chunk in case_gathering_agent.continue_conversation(messages, request.user_response):
-            # Store classification if received
-            try:
-                chunk_data = json.loads(chunk)
-                if chunk_data.get('type') == 'classification_complete' and chunk_data.get('data'):
-                    conversation_classifications[request.conversation_id] = chunk_data['data']
-            except:
-                pass  # Ignore parsing errors for non-JSON chunks
-                
-            yield f"data: {chunk}\n\n"
+        # The agent appends the reply and its answer to messages; only those are stored
+        stored = len(messages)
+        try:
+            # The first exchange was the opening message, so replies are one fewer
+            async for event_type, data in case_gathering_agent.continue_conversation(
+                messages, request.user_response, current_iteration - 1
+            ):
+                # Store classification if received
+                if event_type == 'classification_complete' and data:
+                    await conversation_store.set_classification(request.conversation_id, data)
+                    
+                yield agent_event(event_type, data)
+        finally:
+            # Shielded: EventSourceResponse cancels the generator when the client disconnects
+            await asyncio.shield(conversation_store.append(request.conversation_id, messages[stored:]))
         
-        yield f"data: {json.dumps({'type': 'stream_end'})}\n\n"
-
-    return StreamingResponse(
-        generate_stream(), 
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "*",
-        }
-    )
+        yield stream_end()
+
+    return event_stream(generate_stream())
 
 
 @app.delete("/api/case-gathering/{conversation_id}")
 async def end_case_gathering(conversation_id: str):
     """End a case gathering conversation and clean up resources"""
-    if conversation_id in active_conversations:
-        del active_conversations[conversation_id]
-        if conversation_id in conversation_iterations:
-            del conversation_iterations[conversation_id]
-        if conversation_id in conversation_classifications:
-            del conversation_classifications[conversation_id]
-        return JSONResponse(content={"message": "Conversation ended successfully"})
+    if await conversation_store.delete(conversation_id):
+        return ORJSONResponse(content={"message": "Conversation ended successfully"})
     else:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=404, 
             content={"error": "Conversation not found"}
         )
 
 
+def allows_cache(request: Request) -> bool:
+    """False when the client asks for a fresh answer with Cache-Control: no-cache"""
+    return "no-cache" not in request.headers.get("cache-control", "").lower()
+
+
 @app.post("/api/evaluate")
 async def evaluate(request: Request):
-    data = await request.json()
-    if not data or 'case_description' not in data:
-        return JSONResponse(status_code=400, content={"error": "Missing 'case_description' in request body"})
-    case_description = data['case_description']
-    evaluation_result = evaluation_service.get_evaluation(case_description)
+    payload, error_response = await parse_body(request, EvaluateRequest)
+    if error_response is not None:
+        return error_response
+    case_description = payload.case_description
+    # Non-interactive callers queue the evaluation and poll for the result
+    if request.query_params.get("mode") == "batch":
+        job_id = evaluation_service.submit(case_description)
+        return ORJSONResponse(status_code=202, content={"job_id": job_id, "status": "pending"})
+    evaluation_result = await evaluation_service.get_evaluation(case_description, use_cache=allows_cache(request))
+    return evaluation_response(evaluation_result)
+
+
+@app.get("/api/evaluate/jobs/{job_id}")
+async def get_evaluation_job(job_id: str):
+    """Poll an evaluation queued with /api/evaluate?mode=batch"""
+    job = evaluation_service.get_job(job_id)
+    if job is None:
+        return ORJSONResponse(status_code=404, content={"error": "Job not found"})
+    if not job.done():
+        return ORJSONResponse(status_code=202, content={"job_id": job_id, "status": "pending"})
+    return evaluation_response(job.result())
+
+
+def evaluation_response(evaluation_result):
     if evaluation_result:
-        try:
-            return JSONResponse(content=evaluation_result.model_dump())
-        except Exception as e:
-            print(f"Error in model dump: {e}")
-            return JSONResponse(status_code=500, content={"error": "Failed to process evaluation result"})
+        # Serialized straight to JSON by pydantic-core, without an intermediate dict
+        return Response(content=evaluation_result.model_dump_json(), media_type="application/json")
     else:
-        return JSONResponse(status_code=500, content={"error": "Failed to get case evaluation from OpenAI API. Check server logs for details."})
+        return ORJSONResponse(status_code=500, content={"error": "Failed to get case evaluation from OpenAI API. Check server logs for details."})
+
+
+@app.post("/api/evaluate/stream")
+async def evaluate_stream(request: Request):
+    """Evaluate a case and stream the model output as server-sent events"""
+    payload, error_response = await parse_body(request, EvaluateRequest)
+    if error_response is not None:
+        return error_response
+    case_description = payload.case_description
+
+    async def generate_stream():
+        async for chunk in evaluation_service.get_evaluation_stream(case_description, use_cache=allows_cache(request)):
+            yield ServerSentEvent(data=chunk)
+        
+        yield stream_end()
+
+    return event_stream(generate_stream())
 
 
 @app.get("/api/case-gathering/{conversation_id}")
 async def get_case_gathering_status(conversation_id: str):
     """Get the current status and classification of a case gathering conversation"""
-    if conversation_id not in active_conversations:
-        return JSONResponse(
+    snapshot = await conversation_store.load(conversation_id)
+    if snapshot is None:
+        return ORJSONResponse(
             status_code=404,
             content={"error": "Conversation not found"}
         )
     
-    messages = active_conversations[conversation_id]
-    current_iteration = conversation_iterations.get(conversation_id, 1)
-    current_classification = conversation_classifications.get(conversation_id)
+    messages, current_iteration, current_classification = snapshot
     
     # Extract user messages for case description
     user_messages = [msg['content'] for msg in messages if msg['role'] == 'user']
@@ -209,8 +298,8 @@ async def get_case_gathering_status(conversation_id: str):
             # Create conversation text for analysis
             conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
             
-            # Use openai.responses.parse with BreachInfo model like in the notebook
-            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            # Use openai.responses.parse with a pydantic model like in the notebook
+            client = get_async_openai_client(os.getenv("OPENAI_API_KEY"))
             
             classification_prompt = f"""Based on the following conversation about a GDPR breach incident, please provide a comprehensive classification across the 4 key dimensions.
 
@@ -220,23 +309,23 @@ Conversation History:
 Please analyze the conversation and classify the breach case based on the available information. Make reasonable inferences where information is incomplete."""
 
             # Use openai.responses.parse exactly like in the notebook
-            response = client.responses.parse(
-                model="gpt-4o-2024-08-06",
+            response = await client.responses.parse(
+                model=CLASSIFICATION_MODEL,
                 input=[
                     {"role": "system", "content": "You are an expert GDPR case analysis assistant. Analyze the conversation history and provide a structured classification of the breach incident based on the 4 key dimensions. Make reasonable inferences where information is incomplete."},
                     {"role": "user", "content": classification_prompt}
                 ],
-                text_format=BreachInfo,
+                text_format=BreachClassification,
             )
             
             # Extract the structured classification from parsed output
             forced_classification = response.output_parsed.model_dump()
             # Store the forced classification
-            conversation_classifications[conversation_id] = forced_classification
+            await conversation_store.set_classification(conversation_id, forced_classification)
             current_classification = forced_classification
             
         except Exception as e:
-            print(f"Error forcing classification: {e}")
+            logger.warning("Error forcing classification: %s", e)
             # Fallback to default classification if OpenAI call fails
             current_classification = {
                 "case_description": case_description or "GDPR breach case from conversation",
@@ -245,7 +334,7 @@ Please analyze the conversation and classify the breach case based on the availa
                 "risk_management_and_safeguards": "insufficient_protection",
                 "accountability_and_governance": "partially_accountable"
             }
-            conversation_classifications[conversation_id] = current_classification
+            await conversation_store.set_classification(conversation_id, current_classification)
     
     response_data = {
         "conversation_id": conversation_id,
@@ -270,40 +359,55 @@ Please analyze the conversation and classify the breach case based on the availa
         }
         response_data["case_summary"] = current_classification.get("case_description", case_description)
     
-    return JSONResponse(content=response_data)
+    return ORJSONResponse(content=response_data)
+
+# Served by the prediction endpoint when the workflow couldn't be imported
+WORKFLOW_UNAVAILABLE_RESULT = {
+    "similar_cases": [
+        {
+            "id": "fallback_1",
+            "company": "Meta Platforms Ireland",
+            "description": "Cross-border data transfers without adequate safeguards",
+            "fine": 1200000000,
+            "similarity": 75,
+            "explanation_of_similarity": "Both cases involve cross-border data transfers and insufficient safeguards",
+            "date": "2023-05-22",
+            "authority": "Irish DPC"
+        },
+        {
+            "id": "fallback_2",
+            "company": "Amazon Europe Core",
+            "description": "Inappropriate data processing for advertising purposes",
+            "fine": 746000000,
+            "similarity": 65,
+            "explanation_of_similarity": "Similar violations regarding consent and data processing purposes",
+            "date": "2021-07-30",
+            "authority": "Luxembourg CNPD"
+        }
+    ],
+    "prediction_result": {
+        "predicted_fine": 500000000,
+        "explanation_for_fine": "Based on similar high-impact cases, estimated fine considering severity factors (fallback prediction)"
+    }
+}
+
 
 # Breach Impact Prediction Endpoint
 @app.post("/api/predict-breach-impact")
 async def predict_breach_impact_endpoint(request: Request):
     """Predict GDPR breach impact using LangGraph workflow"""
+    if predict_breach_impact is None:
+        # Fall back to mock data when the workflow is not available
+        return ORJSONResponse(content=WORKFLOW_UNAVAILABLE_RESULT)
+    
     try:
-        # Import here to avoid issues if workflow dependencies aren't available
-        from backend.breach_impact_workflow import predict_breach_impact
-        
-        data = await request.json()
-        
         # Validate required fields
-        required_fields = [
-            'case_description', 'lawfulness_of_processing', 
-            'data_subject_rights_compliance', 'risk_management_and_safeguards',
-            'accountability_and_governance'
-        ]
-        
-        for field in required_fields:
-            if field not in data:
-                return JSONResponse(
-                    status_code=400, 
-                    content={"error": f"Missing required field: {field}"}
-                )
+        payload, error_response = await parse_body(request, BreachImpactRequest)
+        if error_response is not None:
+            return error_response
         
         # Run the workflow
-        result = await predict_breach_impact(
-            case_description=data['case_description'],
-            lawfulness_of_processing=data['lawfulness_of_processing'],
-            data_subject_rights_compliance=data['data_subject_rights_compliance'],
-            risk_management_and_safeguards=data['risk_management_and_safeguards'],
-            accountability_and_governance=data['accountability_and_governance']
-        )
+        result = await predict_breach_impact(**payload.model_dump())
         
         # Ensure the response always has the required structure
         if not result.get('similar_cases'):
@@ -332,43 +436,11 @@ async def predict_breach_impact_endpoint(request: Request):
         
         result['similar_cases'] = validated_cases
         
-        return JSONResponse(content=result)
-        
-    except ImportError as e:
-        # Fallback to mock data if workflow is not available
-        mock_result = {
-            "similar_cases": [
-                {
-                    "id": "fallback_1",
-                    "company": "Meta Platforms Ireland",
-                    "description": "Cross-border data transfers without adequate safeguards",
-                    "fine": 1200000000,
-                    "similarity": 75,
-                    "explanation_of_similarity": "Both cases involve cross-border data transfers and insufficient safeguards",
-                    "date": "2023-05-22",
-                    "authority": "Irish DPC"
-                },
-                {
-                    "id": "fallback_2",
-                    "company": "Amazon Europe Core",
-                    "description": "Inappropriate data processing for advertising purposes",
-                    "fine": 746000000,
-                    "similarity": 65,
-                    "explanation_of_similarity": "Similar violations regarding consent and data processing purposes",
-                    "date": "2021-07-30",
-                    "authority": "Luxembourg CNPD"
-                }
-            ],
-            "prediction_result": {
-                "predicted_fine": 500000000,
-                "explanation_for_fine": "Based on similar high-impact cases, estimated fine considering severity factors (fallback prediction)"
-            }
-        }
-        return JSONResponse(content=mock_result)
+        return ORJSONResponse(content=result)
         
     except Exception as e:
         # Enhanced error handling with fallback
-        print(f"Prediction error: {str(e)}")
+        logger.exception("Prediction error")
         
         fallback_result = {
             "similar_cases": [
@@ -390,30 +462,37 @@ async def predict_breach_impact_endpoint(request: Request):
             "error": f"Prediction failed: {str(e)}"
         }
         
-        return JSONResponse(content=fallback_result)
+        return ORJSONResponse(content=fallback_result)
+
+@app.post("/api/predict-breach-impact/stream")
+async def predict_breach_impact_stream_endpoint(request: Request):
+    """Predict GDPR breach impact, streaming the fine explanation as server-sent events"""
+    if predict_breach_impact_stream is None:
+        return ORJSONResponse(
+            status_code=500,
+            content={"error": f"Breach impact workflow unavailable: {WORKFLOW_IMPORT_ERROR}"}
+        )
+    
+    payload, error_response = await parse_body(request, BreachImpactRequest)
+    if error_response is not None:
+        return error_response
+
+    async def generate_stream():
+        async for chunk in predict_breach_impact_stream(**payload.model_dump()):
+            yield ServerSentEvent(data=chunk)
+        
+        yield stream_end()
+
+    return event_stream(generate_stream())
 
 @app.get("/api/breach-classifications")
-async def get_breach_classifications():
+async def get_breach_classifications(request: Request):
     """Get valid classification values for breach prediction"""
-    return {
-        "lawfulness_of_processing": [
-            "lawful_and_appropriate_basis", "lawful_but_principle_violation", 
-            "no_valid_basis", "exempt_or_restricted"
-        ],
-        "data_subject_rights_compliance": [
-            "full_compliance", "partial_compliance", 
-            "non_compliance", "not_triggered"
-        ],
-        "risk_management_and_safeguards": [
-            "proactive_safeguards", "reactive_only", 
-            "insufficient_protection", "not_applicable"
-        ],
-        "accountability_and_governance": [
-            "fully_accountable", "partially_accountable", 
-            "not_accountable", "not_required"
-        ]
-    }
+    if request.headers.get("if-none-match") == BREACH_CLASSIFICATIONS_ETAG:
+        return Response(status_code=304, headers=BREACH_CLASSIFICATIONS_HEADERS)
+    return Response(content=BREACH_CLASSIFICATIONS_JSON, media_type="application/json",
+                    headers=BREACH_CLASSIFICATIONS_HEADERS)
 
-# Run the FastAPI app
+# Run the FastAPI app with `python -m backend.main` from the project root
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=5000, reload=True)
+    uvicorn.run("backend.main:app", host="127.0.0.1", port=5000, reload=True)
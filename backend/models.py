@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional
 from enum import Enum
 from pydantic import BaseModel, Field
 
@@ -29,3 +29,24 @@ class GdprParagraphList(BaseModel):
     as a response from an API or for validation of a JSON array.
     """
     paragraphs: List[GdprParagraph] = Field(..., description="A list of GDPR paragraph objects.")
+
+class AnalysisResult(BaseModel):
+    """
+    Represents the ReAct agent's analysis of a user turn: which fields
+    could be extracted, which are still missing, and why.
+    """
+    extracted_data: Dict[str, Optional[str]] = Field(default_factory=dict, description="Field values extracted from the user's input.")
+    missing_fields: List[str] = Field(default_factory=list, description="Required fields that are still missing.")
+    confidence_scores: Dict[str, Optional[float]] = Field(default_factory=dict, description="Confidence (0.0-1.0) per extracted field.")
+    analysis_reasoning: str = Field("", description="Brief explanation of the analysis.")
+
+class BreachClassification(BaseModel):
+    """
+    Represents a breach case classified across the four GDPR dimensions,
+    as returned by the forced classification of a conversation.
+    """
+    case_description: str = Field(..., description="Description of the breach case based on the conversation.")
+    lawfulness_of_processing: str = Field(..., description="Classification for lawfulness of processing.")
+    data_subject_rights_compliance: str = Field(..., description="Classification for data subject rights compliance.")
+    risk_management_and_safeguards: str = Field(..., description="Classification for risk management and safeguards.")
+    accountability_and_governance: str = Field(..., description="Classification for accountability and governance.")
@@ -0,0 +1,60 @@
+"""
+Shared OpenAI clients.
+
+Every service used to construct its own OpenAI client, and with it its own
+connection pool, so each one paid for fresh TCP/TLS handshakes. The clients
+here are created once per API key and reused process-wide; they speak HTTP/2
+and keep connections alive so concurrent calls multiplex over a few sockets.
+The async pool is also handed to LangChain's ChatOpenAI, so LangGraph
+workflows and direct SDK calls draw from the same connections. The app
+closes them on shutdown with close_clients().
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from openai import DEFAULT_MAX_RETRIES, AsyncOpenAI, OpenAI
+
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=200, max_connections=1000)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+@lru_cache(maxsize=None)
+def get_openai_client(api_key: Optional[str] = None) -> OpenAI:
+    """Return the process-wide synchronous client for api_key"""
+    return OpenAI(
+        api_key=api_key,
+        http_client=httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the process-wide async connection pool; it carries no credentials"""
+    return httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_async_openai_client(api_key: Optional[str] = None,
+                            max_retries: int = DEFAULT_MAX_RETRIES) -> AsyncOpenAI:
+    """Return the process-wide asynchronous client for api_key.
+
+    Callers should look it up per use rather than keep it, since
+    close_clients() replaces it
+    """
+    return AsyncOpenAI(
+        api_key=api_key,
+        max_retries=max_retries,
+        http_client=get_async_http_client(),
+    )
+
+
+async def close_clients() -> None:
+    """Close the shared async pool on shutdown. The getters then build fresh
+    clients, which callers pick up because they look them up per use
+    """
+    if get_async_http_client.cache_info().currsize:
+        await get_async_http_client().aclose()
+    get_async_openai_client.cache_clear()
+    get_async_http_client.cache_clear()
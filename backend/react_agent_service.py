@@ -6,7 +6,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.models import ChatRequest, ChatResponse
-from backend.ReAct import OpenAIGDPRReActAgentSync
+from backend.ReAct import OpenAIGDPRReActAgent
 
 from load_dotenv import load_dotenv
 
@@ -26,12 +26,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-agent_sessions: Dict[str, OpenAIGDPRReActAgentSync] = {}
+agent_sessions: Dict[str, OpenAIGDPRReActAgent] = {}
 
-def get_or_create_agent(session_id: str) -> OpenAIGDPRReActAgentSync:
+def get_or_create_agent(session_id: str) -> OpenAIGDPRReActAgent:
     """Get existing agent or create new one for session"""
     if session_id not in agent_sessions:
-        agent_sessions[session_id] = OpenAIGDPRReActAgentSync(
+        agent_sessions[session_id] = OpenAIGDPRReActAgent(
             api_key=os.getenv("OPENAI_API_KEY"),
             model="gpt-4"
         )
@@ -39,7 +39,7 @@ def get_or_create_agent(session_id: str) -> OpenAIGDPRReActAgentSync:
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+def chat_endpoint(request: ChatRequest):
     try:
         load_dotenv()
         
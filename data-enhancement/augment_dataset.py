@@ -1,4 +1,7 @@
-import PyPDF2
+import asyncio
+import multiprocessing as mp
+import pdftotext
+import tiktoken
 import openai
 import os
 import sqlite3
@@ -14,124 +17,211 @@ class GDPRViolationClassification(BaseModel):
     risk_management_and_safeguards: str
     accountability_and_governance: str
 
+class GDPRViolationBatch(BaseModel):
+    items: list[GDPRViolationClassification]
+
 # === SETTINGS ===
 openai.api_key = os.getenv("OPENAI_API_KEY")
+# A fresh file; the curated spain_gdpr_fines_with_labels.db (read by
+# add_weaviate_embeddings.py) is never overwritten
+OUTPUT_DB = "spain_gdpr_fines_relabelled.db"
+MAX_CONCURRENT_REQUESTS = 50
+BATCH_SIZE = 5  # verdicts classified per OpenAI request
+MAX_TEXT_TOKENS = 8000  # verdict text sent to the model is capped at this many tokens
+CHUNK_SIZE = 256  # fines rows read from the source database per pass
+TOKEN_ENCODING = tiktoken.encoding_for_model("gpt-4o")
+LABEL_COLUMNS = ["lawfulness_of_processing", "data_subject_rights_compliance", "risk_management_and_safeguards", "accountability_and_governance"]
+
+SYSTEM_PROMPT = "You are a helpful AI assistant. You are required to read a GDRP violation case verdict in spanish and assess the case"
+
+LABEL_INSTRUCTIONS = """
+The 4 characteristics are:
+1. Lawfulness of Processing
+    - lawful_and_appropriate_basis
+    - lawful_but_principle_violation
+    - no_valid_basis
+    - exempt_or_restricted
+
+2. Data Subject Rights Compliance
+    - full_compliance
+    - partial_compliance
+    - non_compliance
+    - not_triggered
+
+3. Risk Management and Safeguards
+    - proactive_safeguards
+    - reactive_only
+    - insufficient_protection
+    - not_applicable
+
+4. Accountability and Governance
+    - fully_accountable
+    - partially_accountable
+    - not_accountable
+    - not_required
+"""
+
+CLASSIFICATION_PROMPT = """
+Analyze the following case report and assign one label from each of the following four GDPR violation characteristics.
+""" + LABEL_INSTRUCTIONS + """
+## Case:
+{spanish_text}
+"""
+
+BATCH_CLASSIFICATION_PROMPT = """
+Analyze each of the following {count} case reports and assign one label from each of the following four GDPR violation characteristics to every case.
+""" + LABEL_INSTRUCTIONS + """
+Return exactly {count} items in `items`, in the same order as the cases below.
+
+{cases}
+"""
 
 
 # === STEP 1: Read PDF text ===
-def extract_text_from_pdf(pdf_file_name):
-    text = ""
+def iter_pdf_pages(pdf_file_name, max_tokens=MAX_TEXT_TOKENS):
+    """Yield the text of each page until max_tokens is used up; the last page is cut to fit"""
     pdf_file_name = os.path.join("verdicts", pdf_file_name)
-    if os.path.isfile(pdf_file_name): 
-        with open(pdf_file_name, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            if len(reader.pages) <= 50:
-                for page in reader.pages:
-                    extracted_text = page.extract_text()
-                    print(extracted_text)
-                    text += extracted_text
-    return text
+    if not os.path.isfile(pdf_file_name):
+        return
+    with open(pdf_file_name, "rb") as f:
+        pdf = pdftotext.PDF(f)
+        remaining = max_tokens
+        for page in pdf:
+            tokens = TOKEN_ENCODING.encode(page)
+            if len(tokens) >= remaining:
+                yield TOKEN_ENCODING.decode(tokens[:remaining])
+                return
+            remaining -= len(tokens)
+            yield page
+
+def extract_text_from_pdf(pdf_file_name):
+    return "".join(iter_pdf_pages(pdf_file_name))
 
 def classify_gdpr_violation(prompt) -> GDPRViolationClassification:
     response = openai.responses.parse(
                 model="gpt-4o-2024-08-06",
                 input=[
-                    {"role": "system", "content": "You are a helpful AI assistant. You are required to read a GDRP violation case verdict in spanish and assess the case"},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 text_format=GDPRViolationClassification,
             )
     return response.output_parsed
 
+async def classify_gdpr_violation_async(client: openai.AsyncOpenAI, prompt) -> GDPRViolationClassification:
+    response = await client.responses.parse(
+                model="gpt-4o-2024-08-06",
+                input=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                text_format=GDPRViolationClassification,
+            )
+    return response.output_parsed
+
+async def classify_gdpr_violation_batch(client: openai.AsyncOpenAI, prompt) -> GDPRViolationBatch:
+    response = await client.responses.parse(
+                model="gpt-4o-2024-08-06",
+                input=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                text_format=GDPRViolationBatch,
+            )
+    return response.output_parsed
+
+def build_prompt(spanish_text):
+    return CLASSIFICATION_PROMPT.format(spanish_text=spanish_text)
+
+def build_batch_prompt(spanish_texts):
+    cases = "\n\n".join(f"### Case {i}:\n{text}" for i, text in enumerate(spanish_texts, 1))
+    return BATCH_CLASSIFICATION_PROMPT.format(count=len(spanish_texts), cases=cases)
+
+def labels_to_tuple(labels):
+    return (labels.lawfulness_of_processing, labels.data_subject_rights_compliance, labels.risk_management_and_safeguards, labels.accountability_and_governance)
+
 def get_gdpr_classifications(row):
     file_name = row['verdict_link'].split('/')[-1]
     if file_name.split('.')[-1] == "pdf":
         spanish_text = extract_text_from_pdf(file_name)
         if spanish_text:
-            prompt = f"""
-            Analyze the following case report and assign one label from each of the following four GDPR violation characteristics.
-
-            The 4 characteristics are:
-            1. Lawfulness of Processing
-                - lawful_and_appropriate_basis
-                - lawful_but_principle_violation
-                - no_valid_basis
-                - exempt_or_restricted
-
-            2. Data Subject Rights Compliance
-                - full_compliance
-                - partial_compliance
-                - non_compliance
-                - not_triggered
-
-            3. Risk Management and Safeguards
-                - proactive_safeguards
-                - reactive_only
-                - insufficient_protection
-                - not_applicable
-
-            4. Accountability and Governance
-                - fully_accountable
-                - partially_accountable
-                - not_accountable
-                - not_required
-
-            ## Case:
-            {spanish_text}
-            """
-            labels = classify_gdpr_violation(prompt)
-            return (labels.lawfulness_of_processing, labels.data_subject_rights_compliance, labels.risk_management_and_safeguards, labels.accountability_and_governance)
+            labels = classify_gdpr_violation(build_prompt(spanish_text))
+            return labels_to_tuple(labels)
     return (None, None, None, None)
 
 
 
 # === MAIN PIPELINE ===
-def main():
+async def classify_texts(client, texts):
+    """Classify all verdict texts, BATCH_SIZE per request and MAX_CONCURRENT_REQUESTS requests at a time"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    results = [(None, None, None, None)] * len(texts)
+    positions = [i for i, text in enumerate(texts) if text]
+
+    async def classify_single(position):
+        try:
+            async with semaphore:
+                labels = await classify_gdpr_violation_async(client, build_prompt(texts[position]))
+        except Exception as e:
+            print(f"⚠️ Classification failed, leaving the row unlabelled: {e}")
+            return
+        if labels is not None:
+            results[position] = labels_to_tuple(labels)
+
+    async def worker(batch):
+        try:
+            async with semaphore:
+                labels = await classify_gdpr_violation_batch(client, build_batch_prompt([texts[i] for i in batch]))
+        except Exception as e:
+            print(f"⚠️ Batch classification failed, retrying one by one: {e}")
+            labels = None
+        if labels is None or len(labels.items) != len(batch):
+            # The answer cannot be matched back by index; classify one by one
+            await asyncio.gather(*(classify_single(i) for i in batch))
+            return
+        for position, item in zip(batch, labels.items):
+            results[position] = labels_to_tuple(item)
+
+    batches = [positions[i:i + BATCH_SIZE] for i in range(0, len(positions), BATCH_SIZE)]
+    await asyncio.gather(*(worker(batch) for batch in batches))
+    return results
+
+
+async def label_chunk(client, df, pool):
+    """Extract and classify the verdict PDFs of one chunk of fines rows;
+    rows without a PDF verdict are kept with empty labels
+    """
+    for column in LABEL_COLUMNS:
+        df[column] = None
+    pdf_rows = df['verdict_link'].str.lower().str.endswith('.pdf', na=False)
+    pdf_files = df.loc[pdf_rows, 'verdict_link'].str.rsplit('/', n=1).str[-1]
+
+    extracted = pool.map(extract_text_from_pdf, pdf_files.tolist(), chunksize=8)
+    results = await classify_texts(client, extracted)
+    df.loc[pdf_rows, LABEL_COLUMNS] = pd.DataFrame(results, index=pdf_files.index, columns=LABEL_COLUMNS)
+    return df
+
+async def label_fines():
     print("🔍 Extracting text from PDF...")
     connector_obj = sqlite3.connect("spain_gdpr_fines_gdpr.db")
+    # Every row is carried into the output, streamed in chunks; only the ones
+    # with a PDF verdict are classified
     query = "SELECT * FROM fines"
-    df = pd.read_sql_query(query, connector_obj)
-    for _, row in df.iterrows():
-        file_name = row['verdict_link'].split('/')[-1]
-        if file_name.split('.')[-1] == "pdf":
-            spanish_text = extract_text_from_pdf(file_name)
-            if spanish_text != "":
-                prompt = f"""
-                Analyze the following case report and assign one label from each of the following four GDPR violation characteristics.
-
-                The 4 characteristics are:
-                1. Lawfulness of Processing
-                    - lawful_and_appropriate_basis
-                    - lawful_but_principle_violation
-                    - no_valid_basis
-                    - exempt_or_restricted
-
-                2. Data Subject Rights Compliance
-                    - full_compliance
-                    - partial_compliance
-                    - non_compliance
-                    - not_triggered
-
-                3. Risk Management and Safeguards
-                    - proactive_safeguards
-                    - reactive_only
-                    - insufficient_protection
-                    - not_applicable
-
-                4. Accountability and Governance
-                    - fully_accountable
-                    - partially_accountable
-                    - not_accountable
-                    - not_required
-
-                Case:
-                {spanish_text}
-                """
-
-                print("🤖 Classifying GDPR violations...")
-                labels = classify_gdpr_violation(prompt)
-                print("\n📊 Assigned Labels:\n", labels)
-        break
+
+    labelled = 0
+    # PDF parsing is CPU-bound, so spread it across all cores; one OpenAI
+    # client (and its connection pool) serves every chunk
+    async with openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")) as client:
+        with mp.Pool(mp.cpu_count()) as pool, sqlite3.connect(OUTPUT_DB) as output_conn:
+            for i, chunk in enumerate(pd.read_sql_query(query, connector_obj, chunksize=CHUNK_SIZE)):
+                print(f"🤖 Classifying GDPR violations (chunk {i + 1})...")
+                chunk = await label_chunk(client, chunk, pool)
+                chunk.to_sql("fines", output_conn, if_exists="replace" if i == 0 else "append", index=False)
+                labelled += chunk[LABEL_COLUMNS[0]].notna().sum()
+    print(f"\n📊 Assigned labels to {labelled} cases")
+
+def main():
+    asyncio.run(label_fines())
 
 if __name__ == "__main__":
     main()
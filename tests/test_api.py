@@ -0,0 +1,63 @@
+"""
+Tests for backend/main.py endpoints that don't need OpenAI, using FastAPI's
+TestClient with the evaluation service stubbed where it would be called
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.models import GdprParagraphList
+
+client = TestClient(main.app)
+
+RESULT = GdprParagraphList(paragraphs=[])
+
+
+def test_batch_mode_queues_the_evaluation_and_returns_202(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(main.evaluation_service, "submit", lambda description: submitted.append(description) or "job-1")
+
+    response = client.post("/api/evaluate?mode=batch", json={"case_description": "Unencrypted laptop stolen"})
+    assert response.status_code == 202
+    assert response.json() == {"job_id": "job-1", "status": "pending"}
+    assert submitted == ["Unencrypted laptop stolen"]
+
+
+def test_job_endpoint_reports_pending_finished_and_unknown_jobs(monkeypatch):
+    loop = asyncio.new_event_loop()
+    pending = loop.create_future()
+    finished = loop.create_future()
+    finished.set_result(RESULT)
+    jobs = {"pending": pending, "finished": finished}
+    monkeypatch.setattr(main.evaluation_service, "get_job", jobs.get)
+
+    assert client.get("/api/evaluate/jobs/pending").status_code == 202
+    response = client.get("/api/evaluate/jobs/finished")
+    assert response.status_code == 200
+    assert response.json() == {"paragraphs": []}
+    assert client.get("/api/evaluate/jobs/unknown").status_code == 404
+    loop.close()
+
+
+def test_breach_classifications_are_served_with_an_etag():
+    response = client.get("/api/breach-classifications")
+    assert response.status_code == 200
+    assert response.headers["etag"] == main.BREACH_CLASSIFICATIONS_ETAG
+    assert "max-age" in response.headers["cache-control"]
+    assert response.json()["lawfulness_of_processing"] == list(main.LAWFULNESS_VALUES)
+
+
+def test_breach_classifications_revalidate_with_304():
+    response = client.get("/api/breach-classifications",
+                          headers={"If-None-Match": main.BREACH_CLASSIFICATIONS_ETAG})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == main.BREACH_CLASSIFICATIONS_ETAG
+
+    stale = client.get("/api/breach-classifications", headers={"If-None-Match": '"stale"'})
+    assert stale.status_code == 200
@@ -0,0 +1,87 @@
+"""
+Tests for backend/conversation_store.py: the store selection and the
+in-process store, which must behave like the Redis one
+"""
+
+import asyncio
+
+from backend.conversation_store import (
+    MemoryConversationStore,
+    RedisConversationStore,
+    create_conversation_store,
+)
+
+MESSAGES = [
+    {"role": "system", "content": "instructions"},
+    {"role": "user", "content": "opening message"},
+]
+
+
+def test_without_redis_url_the_in_process_store_is_used():
+    assert isinstance(create_conversation_store(None), MemoryConversationStore)
+    assert isinstance(create_conversation_store(""), MemoryConversationStore)
+
+
+def test_with_redis_url_the_redis_store_is_used():
+    # Redis.from_url connects lazily, so no server is needed here
+    store = create_conversation_store("redis://localhost:6379/0")
+    assert isinstance(store, RedisConversationStore)
+    asyncio.run(store.close())
+
+
+def test_memory_store_round_trip():
+    async def run():
+        store = MemoryConversationStore()
+        assert await store.load("conv") is None
+
+        await store.create("conv", MESSAGES)
+        assert await store.load("conv") == (MESSAGES, 1, None)
+
+        reply = [{"role": "assistant", "content": "question"}]
+        await store.append("conv", reply)
+        await store.set_classification("conv", {"lawfulness_of_processing": "no_valid_basis"})
+        messages, iteration, classification = await store.load("conv")
+        assert messages == MESSAGES + reply
+        assert iteration == 1
+        assert classification == {"lawfulness_of_processing": "no_valid_basis"}
+
+    asyncio.run(run())
+
+
+def test_memory_store_counts_exchanges_like_redis_incr():
+    async def run():
+        store = MemoryConversationStore()
+        await store.create("conv", MESSAGES)
+        assert await store.next_iteration("conv") == 2
+        assert await store.next_iteration("conv") == 3
+        # INCR on a missing key starts from 0
+        assert await store.next_iteration("unknown") == 1
+
+    asyncio.run(run())
+
+
+def test_memory_store_snapshot_is_a_copy():
+    async def run():
+        store = MemoryConversationStore()
+        await store.create("conv", MESSAGES)
+        messages, _, _ = await store.load("conv")
+        messages.append({"role": "user", "content": "not stored"})
+        assert (await store.load("conv"))[0] == MESSAGES
+
+    asyncio.run(run())
+
+
+def test_memory_store_create_restarts_and_delete_forgets():
+    async def run():
+        store = MemoryConversationStore()
+        await store.create("conv", MESSAGES)
+        await store.next_iteration("conv")
+        await store.set_classification("conv", {"case_description": "old"})
+        await store.create("conv", MESSAGES)
+        assert await store.load("conv") == (MESSAGES, 1, None)
+
+        assert await store.delete("conv") is True
+        assert await store.load("conv") is None
+        assert await store.delete("conv") is False
+
+    asyncio.run(run())
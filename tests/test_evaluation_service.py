@@ -0,0 +1,121 @@
+"""
+Tests for EvaluationService's caching and request coalescing, with the
+OpenAI client replaced by a stub
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import backend.evaluation_service as evaluation_module
+from backend.evaluation_service import EvaluationService
+from backend.models import GdprParagraphList
+
+RESULT = GdprParagraphList(paragraphs=[{
+    "name": "Article 32",
+    "description": "Security of processing",
+    "classification": "high",
+    "summary": "Appropriate technical and organisational measures",
+    "reason": "Customer data was stored unencrypted",
+}])
+
+
+class StubResponses:
+    """Stands in for client.responses; parse() answers after a short delay"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def parse(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(output_parsed=RESULT)
+
+
+class StubEmbeddings:
+    async def create(self, **kwargs):
+        raise RuntimeError("embeddings unavailable")
+
+
+def make_service(monkeypatch):
+    responses = StubResponses()
+    client = SimpleNamespace(responses=responses, embeddings=StubEmbeddings())
+    monkeypatch.setattr(evaluation_module, "get_async_openai_client", lambda *args, **kwargs: client)
+    return EvaluationService(api_key="test-key"), responses
+
+
+def test_concurrent_identical_evaluations_share_one_call(monkeypatch):
+    async def run():
+        service, responses = make_service(monkeypatch)
+        results = await asyncio.gather(*(service.get_evaluation("Unencrypted laptop stolen") for _ in range(5)))
+        assert responses.calls == 1
+        assert all(result == RESULT for result in results)
+        assert service._inflight == {}
+
+    asyncio.run(run())
+
+
+def test_different_descriptions_are_not_coalesced(monkeypatch):
+    async def run():
+        service, responses = make_service(monkeypatch)
+        await asyncio.gather(service.get_evaluation("Case A"), service.get_evaluation("Case B"))
+        assert responses.calls == 2
+
+    asyncio.run(run())
+
+
+def test_repeated_evaluation_is_answered_from_the_cache(monkeypatch):
+    async def run():
+        service, responses = make_service(monkeypatch)
+        assert await service.get_evaluation("Unencrypted laptop stolen") == RESULT
+        assert await service.get_evaluation("Unencrypted laptop stolen") == RESULT
+        assert responses.calls == 1
+
+    asyncio.run(run())
+
+
+def test_use_cache_false_skips_the_cache_and_coalescing(monkeypatch):
+    async def run():
+        service, responses = make_service(monkeypatch)
+        await service.get_evaluation("Unencrypted laptop stolen")
+        await asyncio.gather(*(service.get_evaluation("Unencrypted laptop stolen", use_cache=False) for _ in range(2)))
+        assert responses.calls == 3
+
+    asyncio.run(run())
+
+
+def test_one_cancelled_caller_does_not_cancel_the_shared_call(monkeypatch):
+    async def run():
+        service, responses = make_service(monkeypatch)
+        first = asyncio.ensure_future(service.get_evaluation("Unencrypted laptop stolen"))
+        second = asyncio.ensure_future(service.get_evaluation("Unencrypted laptop stolen"))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == RESULT
+        assert responses.calls == 1
+
+    asyncio.run(run())
+
+
+def test_submitted_job_can_be_polled_until_done(monkeypatch):
+    async def run():
+        service, responses = make_service(monkeypatch)
+        job_id = service.submit("Unencrypted laptop stolen")
+        assert not service.get_job(job_id).done()
+        await service.get_job(job_id)
+        assert service.get_job(job_id).result() == RESULT
+        assert service.get_job("unknown") is None
+
+    asyncio.run(run())
+
+
+def test_running_jobs_survive_a_full_job_cache(monkeypatch):
+    async def run():
+        service, responses = make_service(monkeypatch)
+        service._jobs = evaluation_module.TTLCache(maxsize=1, ttl=60)
+        job_ids = [service.submit(f"Case {i}") for i in range(3)]
+        assert all(service.get_job(job_id) is not None for job_id in job_ids)
+        await asyncio.gather(*(service.get_job(job_id) for job_id in job_ids))
+        # Finished jobs move to the bounded cache, which keeps the newest
+        assert sum(service.get_job(job_id) is not None for job_id in job_ids) == 1
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+"""
+Tests for the bounded history the case-gathering agent sends to the model
+"""
+
+from backend.case_gathering_agent import (
+    HISTORY_EVICTION_STEP,
+    HISTORY_WINDOW,
+    TRANSCRIPT_LINES,
+    render_transcript,
+    windowed_history,
+)
+
+HEAD = [
+    {"role": "system", "content": "instructions"},
+    {"role": "user", "content": "opening message"},
+]
+
+
+def conversation(turns):
+    """HEAD followed by turns alternating assistant question / user answer"""
+    body = [
+        {"role": "assistant", "content": f"question {i // 2}"} if i % 2 == 0
+        else {"role": "user", "content": f"answer {i // 2}"}
+        for i in range(turns)
+    ]
+    return HEAD + body
+
+
+def test_short_history_is_sent_unchanged():
+    messages = conversation(HISTORY_WINDOW)
+    assert windowed_history(messages) is messages
+
+
+def test_long_history_keeps_the_head_and_a_bounded_tail():
+    messages = conversation(HISTORY_WINDOW + 1)
+    window = windowed_history(messages)
+    assert window[:2] == HEAD
+    assert window[3:] == messages[2 + HISTORY_EVICTION_STEP:]
+    assert len(window) - 3 <= HISTORY_WINDOW
+
+
+def test_evicted_user_answers_are_kept_in_a_digest():
+    messages = conversation(HISTORY_WINDOW + 1)
+    digest = windowed_history(messages)[2]
+    assert digest["role"] == "system"
+    evicted = messages[2:2 + HISTORY_EVICTION_STEP]
+    for message in evicted:
+        if message["role"] == "user":
+            assert f"- {message['content']}" in digest["content"]
+        else:
+            assert message["content"] not in digest["content"]
+
+
+def test_prefix_only_changes_once_per_eviction_block():
+    first = windowed_history(conversation(HISTORY_WINDOW + 1))
+    for extra in range(2, HISTORY_EVICTION_STEP + 1):
+        window = windowed_history(conversation(HISTORY_WINDOW + extra))
+        assert window[:3] == first[:3]
+    moved = windowed_history(conversation(HISTORY_WINDOW + HISTORY_EVICTION_STEP + 1))
+    assert moved[2] != first[2]
+
+
+def test_transcript_keeps_the_recent_non_system_messages():
+    messages = conversation(TRANSCRIPT_LINES + 4)
+    transcript = render_transcript(messages)
+    assert len(transcript) == TRANSCRIPT_LINES
+    assert transcript[-1] == f"{messages[-1]['role']}: {messages[-1]['content']}"
+    assert not any(line.startswith("system: ") for line in transcript)
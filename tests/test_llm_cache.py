@@ -0,0 +1,106 @@
+"""
+Tests for the in-process response caches in backend/llm_cache.py
+"""
+
+from backend.llm_cache import ResponseCache, SemanticCache, make_cache_key
+
+
+def test_cache_key_is_stable_and_order_independent():
+    assert make_cache_key(desc="case", model="gpt-4o") == make_cache_key(model="gpt-4o", desc="case")
+    assert make_cache_key(desc="case", model="gpt-4o") != make_cache_key(desc="other case", model="gpt-4o")
+
+
+def test_response_cache_counts_hits_and_misses():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    assert cache.get("key") is None
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    assert cache.stats == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_response_cache_reset_clears_entries_and_counters():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    cache.set("key", "value")
+    cache.get("key")
+    cache.reset()
+    assert cache.stats == {"hits": 0, "misses": 0, "size": 0}
+    assert cache.get("key") is None
+
+
+def unit(dim, index, tilt=0.0):
+    """A vector along axis index, tilted towards the next axis by tilt"""
+    vector = [0.0] * dim
+    vector[index % dim] = 1.0
+    vector[(index + 1) % dim] = tilt
+    return vector
+
+
+def test_semantic_cache_matches_close_embeddings_only():
+    cache = SemanticCache(threshold=0.9, dim=4)
+    cache.add(unit(4, 0), "first")
+    assert cache.lookup(unit(4, 0, tilt=0.1)) == "first"
+    assert cache.lookup(unit(4, 2)) is None
+
+
+def test_semantic_cache_returns_the_most_similar_entry():
+    cache = SemanticCache(threshold=0.5, dim=4)
+    cache.add(unit(4, 0), "first")
+    cache.add(unit(4, 0, tilt=0.5), "second")
+    assert cache.lookup(unit(4, 0, tilt=0.45)) == "second"
+
+
+def test_semantic_cache_grows_past_its_initial_capacity():
+    cache = SemanticCache(threshold=0.99, dim=200)
+    for i in range(150):
+        cache.add(unit(200, i), f"payload {i}")
+    assert len(cache) == 150
+    assert cache.lookup(unit(200, 149)) == "payload 149"
+
+
+def test_semantic_cache_evicts_oldest_entries_beyond_maxsize():
+    cache = SemanticCache(threshold=0.99, dim=16, maxsize=8)
+    for i in range(9):
+        cache.add(unit(16, i), f"payload {i}")
+    assert len(cache) <= 8
+    assert cache.lookup(unit(16, 0)) is None
+    assert cache.lookup(unit(16, 8)) == "payload 8"
+
+
+def test_semantic_cache_persists_and_reloads(tmp_path):
+    cache = SemanticCache(threshold=0.99, dim=4, path=str(tmp_path))
+    cache.add(unit(4, 0), "first")
+    cache.add(unit(4, 1), "second")
+
+    reloaded = SemanticCache(threshold=0.99, dim=4, path=str(tmp_path))
+    assert len(reloaded) == 2
+    assert reloaded.lookup(unit(4, 1)) == "second"
+
+
+def test_semantic_cache_reload_keeps_the_newest_maxsize_entries(tmp_path):
+    cache = SemanticCache(threshold=0.99, dim=16, path=str(tmp_path), maxsize=8)
+    for i in range(11):
+        cache.add(unit(16, i), f"payload {i}")
+
+    reloaded = SemanticCache(threshold=0.99, dim=16, path=str(tmp_path), maxsize=8)
+    assert len(reloaded) == len(cache)
+    assert reloaded.lookup(unit(16, 10)) == "payload 10"
+    assert reloaded.lookup(unit(16, 0)) is None
+
+
+def test_semantic_cache_reset_empties_the_persisted_files(tmp_path):
+    cache = SemanticCache(threshold=0.99, dim=4, path=str(tmp_path))
+    cache.add(unit(4, 0), "first")
+    cache.reset()
+    assert len(cache) == 0
+    assert len(SemanticCache(threshold=0.99, dim=4, path=str(tmp_path))) == 0
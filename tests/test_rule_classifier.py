@@ -0,0 +1,106 @@
+"""
+Tests for the rule-based classifier the case-gathering agent tries before
+asking the model
+"""
+
+from backend.case_gathering_agent import (
+    GOVERNANCE_VALUES,
+    LAWFULNESS_VALUES,
+    RIGHTS_VALUES,
+    RISK_VALUES,
+    RULE_CONFIDENCE_THRESHOLD,
+    _RULE_PATTERNS,
+    _RULE_SCANNER,
+    _RULE_TARGETS,
+    describe_case,
+    opening_message,
+    quick_classify,
+)
+
+CLASSIFICATION_VALUES = {
+    "lawfulness_of_processing": LAWFULNESS_VALUES,
+    "data_subject_rights_compliance": RIGHTS_VALUES,
+    "risk_management_and_safeguards": RISK_VALUES,
+    "accountability_and_governance": GOVERNANCE_VALUES,
+}
+
+CLEAR_CUT = [
+    "user: " + opening_message("We processed customer data with no legal basis and without consent."),
+    "assistant: What security measures were in place?",
+    "user: The database was unencrypted and we had no MFA. Data subjects were never notified, "
+    "and we did not inform them later either. There is no DPO and no records of processing.",
+    "assistant: Anything else?",
+    "user: Honestly there was no valid basis at all. We ignored their access requests, the backups "
+    "were not encrypted, and we had no documentation.",
+]
+
+
+def test_clear_cut_conversation_is_classified_confidently():
+    classification, confidence = quick_classify(CLEAR_CUT)
+    assert confidence > RULE_CONFIDENCE_THRESHOLD
+    assert classification["lawfulness_of_processing"] == "no_valid_basis"
+    assert classification["data_subject_rights_compliance"] == "non_compliance"
+    assert classification["risk_management_and_safeguards"] == "insufficient_protection"
+    assert classification["accountability_and_governance"] == "not_accountable"
+
+
+def test_vague_conversation_has_no_confidence():
+    transcript = ["user: " + opening_message(), "user: Some customer emails leaked last week."]
+    _, confidence = quick_classify(transcript)
+    assert confidence == 0.0
+
+
+def test_only_user_lines_are_scored():
+    transcript = [
+        "assistant: Was it ransomware or phishing? Was the data unencrypted? Was there no legal basis?",
+        "assistant: Were data subjects not notified? Is there no DPO?",
+    ]
+    _, confidence = quick_classify(transcript)
+    assert confidence == 0.0
+
+
+def test_conflicting_answers_lower_the_confidence():
+    transcript = [
+        "user: The laptop was unencrypted. Actually the disk was encrypted, and we run regular security audits.",
+    ]
+    _, confidence = quick_classify(transcript)
+    assert confidence < RULE_CONFIDENCE_THRESHOLD
+
+
+def test_case_description_leaves_out_the_opening_boilerplate():
+    classification, _ = quick_classify(CLEAR_CUT)
+    description = classification["case_description"]
+    assert description.startswith("We processed customer data with no legal basis")
+    assert "I need help classifying" not in description
+    assert "What security measures" not in description
+
+
+def test_describe_case_skips_an_empty_opening():
+    transcript = ["user: " + opening_message(), "user: A USB stick with payroll data was lost."]
+    assert describe_case(transcript) == "A USB stick with payroll data was lost."
+    assert describe_case(["user: " + opening_message()]) == "GDPR breach case from conversation"
+
+
+def scan(text):
+    return [_RULE_TARGETS[match.lastgroup] for match in _RULE_SCANNER.finditer(text)]
+
+
+def test_scanner_has_one_group_per_rule():
+    assert sorted(_RULE_TARGETS.values()) == sorted(
+        (dimension, value) for dimension, values in _RULE_PATTERNS.items() for value in values
+    )
+    for dimension, value in _RULE_TARGETS.values():
+        assert value in CLASSIFICATION_VALUES[dimension]
+
+
+def test_scanner_attributes_each_phrase_to_its_rule():
+    assert scan("It was a phishing attack.") == [("risk_management_and_safeguards", "insufficient_protection")]
+    assert scan("We appointed a DPO.") == [("accountability_and_governance", "fully_accountable")]
+    assert scan("Customers were notified late.") == [("data_subject_rights_compliance", "partial_compliance")]
+    assert scan("WITHOUT CONSENT") == [("lawfulness_of_processing", "no_valid_basis")]
+
+
+def test_scanner_respects_negations():
+    assert ("risk_management_and_safeguards", "proactive_safeguards") not in scan("The files were not encrypted.")
+    assert ("risk_management_and_safeguards", "proactive_safeguards") not in scan("The files were unencrypted.")
+    assert scan("The files were encrypted.") == [("risk_management_and_safeguards", "proactive_safeguards")]
@@ -88,7 +88,7 @@ def test_invalid_input():
         
         response = client.post("/predict-breach-impact", json=invalid_case)
         
-        if response.status_code == 400:
+        if response.status_code == 422:
             print("✅ Invalid input correctly rejected")
         else:
             print(f"❌ Invalid input should have been rejected but got status {response.status_code}")